@@ -49,6 +49,9 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
+        # No 'loaders' option on purpose: Django then wraps these loaders in
+        # the cached loader, so each template is parsed once per process
+        # (in DEBUG too, where edited templates are reloaded automatically).
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -84,6 +87,17 @@ else:
         }
     }
 
+# Cache
+# Catalog pages are cached per catalog version (see meals/cache.py). Use a
+# backend shared by all workers in production so a price edit in the admin
+# expires pages everywhere.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='petfoodhub'),
+    }
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -112,12 +126,26 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
 # Whitenoise storage for compressed static files
-STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+# In production collectstatic (build.sh) writes content-hashed copies
+# (css/style.<hash>.css) plus gzip/brotli siblings and a manifest that
+# {% static %} resolves through. WhiteNoise serves hashed files with
+# far-future "immutable" cache headers. Development keeps plain file names
+# so runserver works without collectstatic.
+STATICFILES_STORAGE = config(
+    'STATICFILES_STORAGE',
+    default='django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+    else 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+)
 
 # Media files (User uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Product image thumbnails (meals.images): widths built on upload, and the
+# size of the background process pool that builds them
+PRODUCT_IMAGE_WIDTHS = (80, 160, 320)
+PRODUCT_IMAGE_WORKERS = config('PRODUCT_IMAGE_WORKERS', default=2, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -135,6 +163,14 @@ MESSAGE_TAGS = {
     messages.WARNING: 'warning',
     messages.ERROR: 'danger',
 }
+# Flash messages live in a signed cookie, so anonymous visitors (e.g. the
+# finder's "valid weight" redirect) never create a session row
+MESSAGE_STORAGE = config('MESSAGE_STORAGE', default='django.contrib.messages.storage.cookie.CookieStorage')
+
+# Sessions
+# Only logins create sessions; cached_db reads them from the cache and only
+# falls back to the database on a miss
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.cached_db')
 
 # Security settings for production
 if not DEBUG:
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', include('meals.urls')),
     path('accounts/', include('accounts.urls')),
     path('education/', include('education.urls')),
+    path('api/', include('api.urls')),
 ]
 
 # Serve media files in development
@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from meals.meal_calculator import calculate_portions
+from meals.models import PetProfile, SavedMeal
+from meals.tests import PLAIN_STATIC_STORAGE, make_meal, make_product
+
+from .views import SAVED_MEALS_PER_PAGE
+
+
+@override_settings(STATICFILES_STORAGE=PLAIN_STATIC_STORAGE)
+class DashboardQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        meals = [
+            make_meal(make_product('dry', '30', '49.99'), make_product('wet', '12', '24.99'),
+                      make_product('treat', '16', '8.99'))
+            for _ in range(5)
+        ]
+        pets = PetProfile.objects.bulk_create(
+            PetProfile(user=cls.user, name=f'Dog {i}', weight=10 + i, age_months=36, life_stage='adult')
+            for i in range(50)
+        )
+        SavedMeal.objects.bulk_create(
+            SavedMeal(
+                user=cls.user, pet=pet, meal=meals[i % len(meals)],
+                **SavedMeal.portion_values(calculate_portions(pet.weight, pet.activity_level, pet.life_stage)),
+            )
+            for pet in pets for i in range(10)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_dashboard_query_budget(self):
+        last_page = 500 // SAVED_MEALS_PER_PAGE
+        for page in (1, last_page):
+            # user, pets, saved meal count, one page of saved meals with pet and meal
+            with self.subTest(page=page), self.assertNumQueries(4):
+                response = self.client.get('/accounts/dashboard/', {'page': page}, secure=True)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['pets']), 50)
+                self.assertEqual(len(response.context['saved_meals']), SAVED_MEALS_PER_PAGE)
+
+    def test_household_plan_query_budget(self):
+        # user, pets, current saved meals, their meals with products, variants
+        with self.assertNumQueries(5):
+            response = self.client.get('/accounts/household/', secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['plan']['pets']), 50)
+        # Cached until a pet, saved meal or the catalog changes
+        with self.assertNumQueries(1):
+            self.client.get('/accounts/household/', secure=True)
@@ -8,4 +8,5 @@ urlpatterns = [
     path('dashboard/', views.user_dashboard, name='user_dashboard'),
     path('pet/add/', views.add_pet, name='add_pet'),
     path('pet/<int:pet_id>/edit/', views.edit_pet, name='edit_pet'),
+    path('household/', views.household_plan, name='household_plan'),
 ]
\ No newline at end of file
@@ -3,8 +3,31 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import transaction
+from meals.meal_calculator import DEFAULT_SUPPLY_DAYS, SUPPLY_HORIZONS
+from meals import household
 from meals.models import PetProfile, SavedMeal
 
+SAVED_MEALS_PER_PAGE = 20
+
+
+def _supply_days(data, key='supply_days'):
+    """Shopping horizon from form data, falling back to the default for unknown values"""
+    try:
+        days = int(data.get(key, DEFAULT_SUPPLY_DAYS))
+    except ValueError:
+        return DEFAULT_SUPPLY_DAYS
+    return days if days in SUPPLY_HORIZONS else DEFAULT_SUPPLY_DAYS
+
+
+def _pet_form_context(**context):
+    context.update(
+        supply_day_choices=PetProfile._meta.get_field('supply_days').choices,
+        default_supply_days=DEFAULT_SUPPLY_DAYS,
+    )
+    return context
+
 
 def register(request):
     """User registration"""
@@ -50,11 +73,17 @@ def user_logout(request):
 def user_dashboard(request):
     """User dashboard showing pets and saved meals"""
     pets = PetProfile.objects.filter(user=request.user)
-    saved_meals = SavedMeal.objects.filter(user=request.user, is_current=True)
+    saved_meals = SavedMeal.objects.filter(
+        user=request.user, is_current=True
+    ).select_related('pet', 'meal')
+    
+    # Paginate saved plans so power users don't render hundreds of rows
+    page = Paginator(saved_meals, SAVED_MEALS_PER_PAGE).get_page(request.GET.get('page'))
     
     context = {
         'pets': pets,
-        'saved_meals': saved_meals,
+        'saved_meals': page,
+        'page_obj': page,
     }
     
     return render(request, 'accounts/dashboard.html', context)
@@ -84,12 +113,13 @@ def add_pet(request):
             age_months=age_months,
             life_stage=life_stage,
             activity_level=activity_level,
+            supply_days=_supply_days(request.POST),
         )
         
         messages.success(request, f'{name} added successfully!')
         return redirect('user_dashboard')
     
-    return render(request, 'accounts/add_pet.html')
+    return render(request, 'accounts/add_pet.html', _pet_form_context())
 
 
 @login_required
@@ -102,6 +132,7 @@ def edit_pet(request, pet_id):
         pet.weight = int(request.POST.get('weight'))
         pet.age_months = int(request.POST.get('age_months'))
         pet.activity_level = request.POST.get('activity_level')
+        pet.supply_days = _supply_days(request.POST)
         
         # Update life stage
         if pet.age_months < 12:
@@ -111,8 +142,22 @@ def edit_pet(request, pet_id):
         else:
             pet.life_stage = 'senior'
         
-        pet.save()
+        # Saved meal portions are re-synced by a post_save signal; keep both in one transaction
+        with transaction.atomic():
+            pet.save()
         messages.success(request, f'{pet.name} updated successfully!')
         return redirect('user_dashboard')
     
-    return render(request, 'accounts/edit_pet.html', {'pet': pet})
\ No newline at end of file
+    return render(request, 'accounts/edit_pet.html', _pet_form_context(pet=pet))
+
+
+@login_required
+def household_plan(request):
+    """One combined shopping list for all of the user's pets"""
+    days = _supply_days(request.GET, 'days')
+    context = {
+        'plan': household.household_plan(request.user, days),
+        'days': days,
+        'supply_horizons': SUPPLY_HORIZONS,
+    }
+    return render(request, 'accounts/household.html', context)
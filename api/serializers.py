@@ -0,0 +1,131 @@
+"""
+Lightweight serializers for the JSON API
+
+Recommendations are built from queryset .values() rows (costed by
+meals.plans) rather than model instances, and only the columns needed for the
+requested fields are selected.
+"""
+from meals.plans import COST_COLUMNS
+
+PRODUCT_SLOTS = {
+    # API key: (Meal FK, quantity annotation)
+    'dry_food': ('dry_food', 'dry_quantity'),
+    'wet_food': ('wet_food', 'wet_quantity'),
+    'treats': ('treats', 'treat_quantity'),
+}
+
+PRODUCT_COLUMNS = ('id', 'name', 'brand', 'price', 'package_size', 'package_unit', 'affiliate_link')
+
+RECOMMENDATION_FIELDS = {
+    # API field: columns it needs from Meal.objects.candidates(...).values()
+    'id': ('id',),
+    'name': ('name',),
+    'brand': ('brand',),
+    'size_category': ('size_category',),
+    'life_stage': ('life_stage',),
+    'preference_tags': ('preference_tags',),
+    'is_featured': ('is_featured',),
+    'total_cost': ('total_cost',),
+    'cost_per_day': ('cost_per_day',),
+    **{
+        slot: tuple(f'{fk}__{column}' for column in PRODUCT_COLUMNS) + (quantity,)
+        for slot, (fk, quantity) in PRODUCT_SLOTS.items()
+    },
+}
+
+DEFAULT_FIELDS = tuple(RECOMMENDATION_FIELDS)
+
+# Computed per dog by meals.plans (in SQL or rank_candidates)
+COST_ANNOTATIONS = ('dry_quantity', 'wet_quantity', 'treat_quantity', 'total_cost', 'cost_per_day')
+
+
+def parse_fields(value):
+    """
+    Parse the ?fields=id,name,total_cost selector into a tuple of field names
+    Raises ValueError for unknown fields
+    """
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in RECOMMENDATION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields or DEFAULT_FIELDS
+
+
+def recommendation_columns(fields):
+    """Columns to pass to .values() for the selected fields"""
+    columns = []
+    for field in fields:
+        columns.extend(RECOMMENDATION_FIELDS[field])
+    return list(dict.fromkeys(columns))
+
+
+def candidate_columns(fields):
+    """
+    Columns for loading candidate meals once and costing them per dog:
+    the selected fields minus per-dog annotations, plus the product ids,
+    price/package size snapshot and tie-break columns used for costing
+    """
+    columns = [c for c in recommendation_columns(fields) if c not in COST_ANNOTATIONS]
+    return list(dict.fromkeys(columns + list(COST_COLUMNS)))
+
+
+def _money(value):
+    return round(float(value), 2)
+
+
+def serialize_recommendation(row, fields):
+    """Turn one .values() row into the API representation"""
+    data = {}
+    for field in fields:
+        if field in PRODUCT_SLOTS:
+            fk, quantity = PRODUCT_SLOTS[field]
+            data[field] = {
+                'id': row[f'{fk}__id'],
+                'name': row[f'{fk}__name'],
+                'brand': row[f'{fk}__brand'],
+                'price': _money(row[f'{fk}__price']),
+                'package_size': float(row[f'{fk}__package_size']),
+                'package_unit': row[f'{fk}__package_unit'],
+                'affiliate_link': row[f'{fk}__affiliate_link'],
+                'quantity': int(row[quantity]),
+                'packages': [
+                    {'package_size': float(size), 'price': _money(price), 'quantity': count}
+                    for size, price, count in row[f'{fk}_packages']
+                ],
+            }
+        elif field in ('total_cost', 'cost_per_day'):
+            data[field] = _money(row[field])
+        else:
+            data[field] = row[field]
+    return data
+
+
+def serialize_supply(supply):
+    """Supply (including its days) without the nested daily portions (sent separately)"""
+    return {key: value for key, value in supply.items() if key != 'daily_portions'}
+
+
+def _packages(packages):
+    return [
+        {'package_size': float(p['package_size']), 'price': _money(p['price']), 'quantity': p['quantity']}
+        for p in packages
+    ]
+
+
+def serialize_household(plan):
+    """JSON form of a meals.household plan"""
+    return {
+        'days': plan['days'],
+        'pets': plan['pets'],
+        'shopping_list': [
+            {
+                **{key: item[key] for key in ('product', 'lbs_needed', 'quantity', 'pets')},
+                'packages': _packages(item['packages']),
+                'cost': _money(item['cost']),
+            }
+            for item in plan['shopping_list']
+        ],
+        **{key: _money(plan[key]) for key in ('total_cost', 'cost_per_day', 'separate_cost', 'savings')},
+    }
@@ -0,0 +1,240 @@
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from education.models import Article
+from meals.meal_calculator import calculate_portions, calculate_supply
+from meals.models import PackageVariant
+from meals.tests import make_meal, make_product
+
+from .serializers import DEFAULT_FIELDS
+
+
+def make_catalog():
+    """Medium and large adult meals, a few grain free, some with variants"""
+    for i in range(8):
+        meal = make_meal(
+            make_product('dry', ('30', '15', '24')[i % 3], f'{40 + i}.99'),
+            make_product('wet', '12', f'{20 + i}.49', calories_per_oz=Decimal('25')),
+            make_product('treat', '16', '8.99', calories_per_oz=Decimal('87.5')),
+            size_category=('medium', 'large')[i % 2],
+            preference_tags='grain_free' if i % 4 < 2 else '',
+            is_featured=i == 3,
+        )
+        if i % 3 == 0:
+            PackageVariant.objects.create(product=meal.dry_food, package_size=Decimal('4'), price=Decimal('9.99'))
+
+
+class RecommendationsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog()
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, **params):
+        response = self.client.get('/api/recommendations/', params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_success_payload(self):
+        data = self.get(weight=40, life_stage='adult', activity_level='high')
+        supply = calculate_supply(40, 'high', 'adult', 45)
+
+        self.assertEqual(
+            {key: data[key] for key in ('weight', 'life_stage', 'activity_level', 'size_category')},
+            {'weight': 40, 'life_stage': 'adult', 'activity_level': 'high', 'size_category': 'medium'},
+        )
+        self.assertEqual(data['portions'], calculate_portions(40, 'high', 'adult'))
+        self.assertEqual(data['supply'], {key: value for key, value in supply.items() if key != 'daily_portions'})
+
+        recommendations = data['recommendations']
+        self.assertEqual(len(recommendations), 4)
+        self.assertEqual({r['size_category'] for r in recommendations}, {'medium'})
+        self.assertEqual(list(recommendations[0]), list(DEFAULT_FIELDS))
+        costs = [r['total_cost'] for r in recommendations]
+        self.assertEqual(costs, sorted(costs))
+        for recommendation in recommendations:
+            self.assertAlmostEqual(recommendation['cost_per_day'], recommendation['total_cost'] / 45, delta=0.01)
+            dry = recommendation['dry_food']
+            self.assertEqual(dry['quantity'], sum(p['quantity'] for p in dry['packages']))
+            self.assertGreaterEqual(sum(p['package_size'] * p['quantity'] for p in dry['packages']),
+                                    supply['dry_food_lbs'])
+
+    def test_preference_and_limit(self):
+        data = self.get(weight=40, preference='grain_free', limit=1)
+        self.assertEqual(len(data['recommendations']), 1)
+        self.assertEqual(data['recommendations'][0]['preference_tags'], 'grain_free')
+
+    def test_fields_narrow_the_columns(self):
+        full = self.get(weight=80)
+        narrow = self.get(weight=80, fields='id,total_cost')
+
+        self.assertEqual([list(r) for r in narrow['recommendations']], [['id', 'total_cost']] * 4)
+        self.assertEqual(
+            narrow['recommendations'],
+            [{'id': r['id'], 'total_cost': r['total_cost']} for r in full['recommendations']],
+        )
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/recommendations/', {'weight': 40, 'fields': 'id,secret'}, secure=True)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['error'])
+
+    def test_days_override_the_supply_horizon(self):
+        default = self.get(weight=40)
+        days = self.get(weight=40, days=90)
+
+        self.assertEqual(default['supply']['days'], 45)
+        self.assertEqual(days['supply'], {
+            key: value for key, value in calculate_supply(40, 'moderate', 'adult', 90).items()
+            if key != 'daily_portions'
+        })
+        self.assertEqual(days['portions'], default['portions'])
+        for recommendation in days['recommendations']:
+            self.assertAlmostEqual(recommendation['cost_per_day'], recommendation['total_cost'] / 90, delta=0.01)
+        self.assertGreater(days['recommendations'][0]['total_cost'], default['recommendations'][0]['total_cost'])
+
+    def test_unsupported_horizon_is_rejected(self):
+        response = self.client.get('/api/recommendations/', {'weight': 40, 'days': 60}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchRecommendationValidationTests(TestCase):
+
+    def post(self, payload):
+        return self.client.post(
+            '/api/recommendations/batch/', json.dumps(payload), content_type='application/json', secure=True,
+        )
+
+    def test_malformed_options_are_rejected(self):
+        for options in ({'fields': 5}, {'fields': {'id': 1}}, {'limit': [1]}, {'limit': {'n': 1}}):
+            with self.subTest(options=options):
+                response = self.post({'dogs': [{'weight': 40}], **options})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_malformed_dogs_get_error_entries(self):
+        dogs = [
+            {'weight': 40, 'preference': 5},
+            {'weight': 40, 'life_stage': ['adult']},
+            {'weight': 40, 'activity_level': {'level': 'high'}},
+            {'weight': [40]},
+            {'weight': 40, 'days': [45]},
+            {'weight': 40},
+        ]
+        response = self.post({'dogs': dogs, 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(['error' in result for result in results], [True] * 5 + [False])
+
+    def test_non_finite_numbers_are_rejected(self):
+        # json.loads accepts Infinity, which int() can't convert
+        response = self.client.post(
+            '/api/recommendations/batch/', '{"dogs": [{"weight": Infinity}], "limit": 1}',
+            content_type='application/json', secure=True,
+        )
+        self.assertIn('error', response.json()['results'][0])
+
+
+class BatchRecommendationsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        make_catalog()
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, payload):
+        response = self.client.post(
+            '/api/recommendations/batch/', json.dumps(payload), content_type='application/json', secure=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def dogs(self, count):
+        # Three groups: medium adult, large adult, medium adult grain free;
+        # weights, activity levels and horizons vary within each group
+        groups = (
+            {'weight': 30, 'preference': ''},
+            {'weight': 70, 'preference': ''},
+            {'weight': 30, 'preference': 'Grain-Free'},
+        )
+        return [
+            dict(
+                groups[i % 3], id=f'dog-{i}', weight=groups[i % 3]['weight'] + i % 20,
+                activity_level=('low', 'moderate', 'high')[i // 3 % 3], days=(14, 30, 45, 90)[i % 4],
+            )
+            for i in range(count)
+        ]
+
+    def test_queries_scale_with_groups_not_dogs(self):
+        # One candidate query per group, then one for package variants
+        for count in (3, 100):
+            with self.subTest(dogs=count), self.assertNumQueries(4):
+                results = self.post({'dogs': self.dogs(count), 'limit': 3})
+            self.assertEqual(len(results), count)
+            self.assertFalse([result for result in results if 'error' in result])
+
+    def test_each_result_matches_the_single_dog_endpoint(self):
+        dogs = self.dogs(24)
+        results = self.post({'dogs': dogs, 'limit': 3})
+
+        for index, (dog, result) in enumerate(zip(dogs, results)):
+            self.assertEqual((result['index'], result['id']), (index, dog['id']))
+            params = {key: value for key, value in dog.items() if key != 'id'}
+            single = self.client.get('/api/recommendations/', dict(params, limit=3), secure=True).json()
+            self.assertEqual({key: result[key] for key in single}, single, dog)
+
+    def test_fields_apply_to_every_dog(self):
+        results = self.post({'dogs': self.dogs(6), 'fields': ['id', 'cost_per_day']})
+        for result in results:
+            self.assertTrue(result['recommendations'])
+            self.assertEqual({tuple(r) for r in result['recommendations']}, {('id', 'cost_per_day')})
+
+
+class ArticleSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(4):
+            Article.objects.create(
+                slug=f'salmon-{i}', title=f'Salmon guide {i}', summary='Omega oils', content='Salmon skin.',
+                category='health' if i % 2 else 'nutrition',
+            )
+
+    def get(self, **params):
+        return self.client.get('/api/articles/search/', params, secure=True)
+
+    def test_results_payload(self):
+        payload = self.get(q=' salmon ', limit=3).json()
+        self.assertEqual(payload['query'], 'salmon')
+        self.assertTrue(payload['has_more'])
+        self.assertEqual(len(payload['results']), 3)
+        self.assertEqual(
+            set(payload['results'][0]), {'id', 'title', 'slug', 'category', 'summary', 'rank', 'snippet'},
+        )
+        self.assertIn('<mark>Salmon</mark>', payload['results'][0]['snippet'])
+
+    def test_last_page_and_category(self):
+        payload = self.get(q='salmon', limit=3, offset=3).json()
+        self.assertEqual(len(payload['results']), 1)
+        self.assertFalse(payload['has_more'])
+
+        payload = self.get(q='salmon', category='health').json()
+        self.assertEqual({result['category'] for result in payload['results']}, {'health'})
+        self.assertEqual(len(payload['results']), 2)
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({}, {'q': '  '}, {'q': 'x' * 201}, {'q': 'salmon', 'category': 'recipes'},
+                       {'q': 'salmon', 'limit': 'ten'}, {'q': 'salmon', 'offset': -1},
+                       {'q': 'salmon', 'offset': 1001}):
+            with self.subTest(params=params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
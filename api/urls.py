@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('recommendations/', views.recommendations, name='api_recommendations'),
+    path('recommendations/batch/', views.batch_recommendations, name='api_batch_recommendations'),
+    path('household/', views.household, name='api_household'),
+    path('articles/search/', views.article_search, name='api_article_search'),
+]
@@ -0,0 +1,269 @@
+import json
+from collections import defaultdict
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from education.models import Article
+from education.search import search_articles
+from meals.cache import cache_catalog_page, conditional_catalog_page
+from meals.meal_calculator import (
+    DEFAULT_SUPPLY_DAYS, MAX_WEIGHT_LBS, SUPPLY_HORIZONS, calculate_portions, calculate_supply,
+    get_size_category,
+)
+from meals.household import household_plan
+from meals.models import Meal, PetProfile, parse_preference_tags
+from meals.plans import package_variants, product_ids, rank_candidates, rank_meals
+
+from .serializers import (
+    candidate_columns, parse_fields, serialize_household, serialize_recommendation, serialize_supply,
+)
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MAX_BATCH_DOGS = 100
+MAX_SEARCH_OFFSET = 1000
+MAX_SEARCH_QUERY_LENGTH = 200
+
+LIFE_STAGES = {key for key, _ in PetProfile.LIFE_STAGES}
+ACTIVITY_LEVELS = {key for key, _ in PetProfile.ACTIVITY_LEVELS}
+ARTICLE_CATEGORIES = {key for key, _ in Article.CATEGORIES}
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def _dog_params(data):
+    """
+    Validate one dog's parameters from a query dict or JSON object
+    Returns (weight, life_stage, activity_level, preference, days); raises ValueError
+    """
+    try:
+        weight = int(data.get('weight', 0))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('weight must be a whole number of pounds')
+    if weight < 5:
+        raise ValueError('weight must be at least 5 lbs')
+    if weight > MAX_WEIGHT_LBS:
+        raise ValueError(f'weight must be at most {MAX_WEIGHT_LBS} lbs')
+
+    life_stage = data.get('life_stage') or 'adult'
+    if not isinstance(life_stage, str) or life_stage not in LIFE_STAGES:
+        raise ValueError(f'life_stage must be one of: {", ".join(sorted(LIFE_STAGES))}')
+
+    activity_level = data.get('activity_level') or 'moderate'
+    if not isinstance(activity_level, str) or activity_level not in ACTIVITY_LEVELS:
+        raise ValueError(f'activity_level must be one of: {", ".join(sorted(ACTIVITY_LEVELS))}')
+
+    preference = data.get('preference') or ''
+    if not isinstance(preference, str):
+        raise ValueError('preference must be a string')
+    preference = preference.strip()
+
+    return weight, life_stage, activity_level, preference, _days(data.get('days'))
+
+
+def _days(value):
+    """Validated supply horizon (default 45); raises ValueError"""
+    try:
+        days = int(value or DEFAULT_SUPPLY_DAYS)
+    except (TypeError, ValueError, OverflowError):
+        days = None
+    if days not in SUPPLY_HORIZONS:
+        raise ValueError(f'days must be one of: {", ".join(map(str, SUPPLY_HORIZONS))}')
+    return days
+
+
+def _limit(value):
+    try:
+        limit = int(value or DEFAULT_LIMIT)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('limit must be a whole number')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _offset(value):
+    try:
+        offset = int(value or 0)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError('offset must be a whole number')
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        raise ValueError(f'offset must be between 0 and {MAX_SEARCH_OFFSET}')
+    return offset
+
+
+def _recommendation_params(request):
+    """Normalized request parameters, used for the response and cache keys"""
+    return (
+        *_dog_params(request.GET),
+        _limit(request.GET.get('limit')),
+        parse_fields(request.GET.get('fields', '')),
+    )
+
+
+@require_GET
+@conditional_catalog_page(_recommendation_params)
+@cache_catalog_page(_recommendation_params)
+def recommendations(request):
+    """
+    Portions, supply for the horizon (days, default 45) and ranked meal
+    recommendations for one dog
+
+    GET /api/recommendations/?weight=40&life_stage=adult&activity_level=moderate
+        &preference=grain_free&days=30&limit=10&fields=id,name,total_cost
+    """
+    try:
+        weight, life_stage, activity_level, preference, days, limit, fields = _recommendation_params(request)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+
+    size_category = get_size_category(weight)
+    supply = calculate_supply(weight, activity_level, life_stage, days)
+
+    rows, _ = rank_meals(
+        Meal.objects.candidates(size_category, life_stage, preference), supply, candidate_columns(fields), limit,
+    )
+
+    return _json({
+        'weight': weight,
+        'life_stage': life_stage,
+        'activity_level': activity_level,
+        'size_category': size_category,
+        'portions': calculate_portions(weight, activity_level, life_stage),
+        'supply': serialize_supply(supply),
+        'recommendations': [serialize_recommendation(row, fields) for row in rows],
+    })
+
+
+@csrf_exempt
+@require_POST
+def batch_recommendations(request):
+    """
+    Ranked meal plans for up to MAX_BATCH_DOGS dogs in one request
+
+    POST /api/recommendations/batch/
+        {"dogs": [{"id": "rex", "weight": 40, "life_stage": "adult", "days": 30}, ...],
+         "limit": 5, "fields": "id,name,total_cost"}
+
+    Dogs are grouped by (size category, life stage, preference) and candidate
+    meals are loaded once per group (package variants once for the batch), so
+    queries scale with distinct groups rather than the number of dogs.
+    Invalid dogs get an error entry instead of failing the whole batch.
+    """
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return _json({'error': 'Request body must be JSON'}, status=400)
+
+    dogs = payload.get('dogs') if isinstance(payload, dict) else None
+    if not isinstance(dogs, list) or not dogs:
+        return _json({'error': 'dogs must be a non-empty list'}, status=400)
+    if len(dogs) > MAX_BATCH_DOGS:
+        return _json({'error': f'At most {MAX_BATCH_DOGS} dogs per request'}, status=400)
+
+    fields = payload.get('fields') or ''
+    if isinstance(fields, list):
+        fields = ','.join(str(f) for f in fields)
+    try:
+        if not isinstance(fields, str):
+            raise ValueError('fields must be a string or a list of field names')
+        limit = _limit(payload.get('limit'))
+        fields = parse_fields(fields)
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+
+    results = [None] * len(dogs)
+    groups = defaultdict(list)
+    for index, dog in enumerate(dogs):
+        results[index] = {'index': index}
+        if not isinstance(dog, dict):
+            results[index]['error'] = 'Each dog must be an object'
+            continue
+        if 'id' in dog:
+            results[index]['id'] = dog['id']
+        try:
+            weight, life_stage, activity_level, preference, days = _dog_params(dog)
+        except ValueError as e:
+            results[index]['error'] = str(e)
+            continue
+        group = (get_size_category(weight), life_stage, ' '.join(sorted(parse_preference_tags(preference))))
+        groups[group].append((index, weight, life_stage, activity_level, days))
+
+    columns = candidate_columns(fields)
+    candidates = {
+        group: list(Meal.objects.candidates(*group).values(*columns))
+        for group in groups
+    }
+    variants = package_variants(set().union(*map(product_ids, candidates.values())))
+    for (size_category, life_stage, preference), members in groups.items():
+        for index, weight, life_stage, activity_level, days in members:
+            supply = calculate_supply(weight, activity_level, life_stage, days)
+            results[index].update({
+                'weight': weight,
+                'life_stage': life_stage,
+                'activity_level': activity_level,
+                'size_category': size_category,
+                'portions': supply['daily_portions'],
+                'supply': serialize_supply(supply),
+                'recommendations': [
+                    serialize_recommendation(row, fields)
+                    for row in rank_candidates(candidates[size_category, life_stage, preference], supply, variants, limit)
+                ],
+            })
+
+    return _json({'results': results})
+
+
+@require_GET
+def household(request):
+    """
+    Combined plan and shopping list for every pet of the signed-in user
+
+    GET /api/household/?days=30
+
+    Shared products are merged across pets before packages are chosen.
+    Cached per user until a pet, saved meal or the catalog changes.
+    """
+    if not request.user.is_authenticated:
+        return _json({'error': 'Authentication required'}, status=401)
+    try:
+        days = _days(request.GET.get('days'))
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+
+    return _json(serialize_household(household_plan(request.user, days)))
+
+
+@require_GET
+def article_search(request):
+    """
+    Ranked full-text search over published articles, with highlighted snippets
+
+    GET /api/articles/search/?q=grain+free+diet&category=nutrition&limit=10&offset=0
+
+    snippet is HTML: escaped article text with matches wrapped in <mark>.
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return _json({'error': 'q is required'}, status=400)
+    if len(query) > MAX_SEARCH_QUERY_LENGTH:
+        return _json({'error': f'q must be at most {MAX_SEARCH_QUERY_LENGTH} characters'}, status=400)
+
+    category = request.GET.get('category') or None
+    if category is not None and category not in ARTICLE_CATEGORIES:
+        return _json({'error': f'category must be one of: {", ".join(sorted(ARTICLE_CATEGORIES))}'}, status=400)
+    try:
+        limit = _limit(request.GET.get('limit'))
+        offset = _offset(request.GET.get('offset'))
+    except ValueError as e:
+        return _json({'error': str(e)}, status=400)
+
+    # One extra row tells whether there is a next page without a COUNT
+    results = search_articles(query, category, limit + 1, offset)
+    return _json({
+        'query': query,
+        'results': results[:limit],
+        'has_more': len(results) > limit,
+    })
@@ -6,13 +6,8 @@ set -o errexit
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# Collect static files
-python manage.py collectstatic --no-input
+# Collect static files: hashed names, gzip/brotli copies and the manifest
+python manage.py collectstatic --no-input --clear
 
 # Run migrations
 python manage.py migrate
-```
-
-**Don't forget to make it executable:**
-```bash
-chmod +x build.sh
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Article
+from .search import matching_articles
 
 
 @admin.register(Article)
@@ -8,4 +9,11 @@ class ArticleAdmin(admin.ModelAdmin):
     list_filter = ['category', 'is_published']
     search_fields = ['title', 'content']
     prepopulated_fields = {'slug': ('title',)}
-    list_editable = ['is_published']
\ No newline at end of file
+    list_editable = ['is_published']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of icontains scans over content
+        matches = matching_articles(search_term) if search_term.strip() else None
+        if matches is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=matches), False
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from education.search import optimize_index
+
+
+class Command(BaseCommand):
+    help = 'Compact the article full-text index (run after bulk article imports, or nightly)'
+
+    def handle(self, *args, **options):
+        optimize_index()
+        self.stdout.write(self.style.SUCCESS('Article search index optimized'))
@@ -0,0 +1,86 @@
+from django.db import migrations
+
+# PostgreSQL: the database recomputes the vector on every insert/update
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE education_article ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX education_article_search_idx ON education_article USING gin (search_vector)',
+]
+POSTGRES_BACKWARD = [
+    'ALTER TABLE education_article DROP COLUMN search_vector',
+]
+
+# SQLite: external-content FTS5 table, kept in sync by triggers
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE education_article_fts USING fts5(
+        title, summary, content,
+        content='education_article', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    # Title, summary and content weights for ORDER BY rank
+    "INSERT INTO education_article_fts(education_article_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    """
+    CREATE TRIGGER education_article_fts_insert AFTER INSERT ON education_article BEGIN
+        INSERT INTO education_article_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER education_article_fts_delete AFTER DELETE ON education_article BEGIN
+        INSERT INTO education_article_fts(education_article_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+    END
+    """,
+    # Only reindex when searchable text changes (not on is_published toggles)
+    """
+    CREATE TRIGGER education_article_fts_update AFTER UPDATE OF title, summary, content ON education_article BEGIN
+        INSERT INTO education_article_fts(education_article_fts, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+        INSERT INTO education_article_fts(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END
+    """,
+    "INSERT INTO education_article_fts(education_article_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS education_article_fts_update',
+    'DROP TRIGGER IF EXISTS education_article_fts_delete',
+    'DROP TRIGGER IF EXISTS education_article_fts_insert',
+    'DROP TABLE IF EXISTS education_article_fts',
+]
+
+STATEMENTS = {
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def _run(schema_editor, direction):
+    # Other backends have no index; education.search falls back to icontains
+    for sql in STATEMENTS.get(schema_editor.connection.vendor, ((), ()))[direction]:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, 0)
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,90 @@
+from django.db import migrations
+
+# A second, much smaller index over title and summary only. Search ranks
+# these matches first, so broad queries never rank every article body.
+
+# PostgreSQL: the database recomputes the vector on every insert/update
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE education_article ADD COLUMN head_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(summary, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX education_article_head_idx ON education_article USING gin (head_vector)',
+]
+POSTGRES_BACKWARD = [
+    'ALTER TABLE education_article DROP COLUMN head_vector',
+]
+
+# SQLite: external-content FTS5 table, kept in sync by triggers
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE education_article_head_fts USING fts5(
+        title, summary,
+        content='education_article', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    # Same title and summary weights as education_article_fts
+    "INSERT INTO education_article_head_fts(education_article_head_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0)')",
+    """
+    CREATE TRIGGER education_article_head_fts_insert AFTER INSERT ON education_article BEGIN
+        INSERT INTO education_article_head_fts(rowid, title, summary)
+        VALUES (new.id, new.title, new.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER education_article_head_fts_delete AFTER DELETE ON education_article BEGIN
+        INSERT INTO education_article_head_fts(education_article_head_fts, rowid, title, summary)
+        VALUES ('delete', old.id, old.title, old.summary);
+    END
+    """,
+    """
+    CREATE TRIGGER education_article_head_fts_update AFTER UPDATE OF title, summary ON education_article BEGIN
+        INSERT INTO education_article_head_fts(education_article_head_fts, rowid, title, summary)
+        VALUES ('delete', old.id, old.title, old.summary);
+        INSERT INTO education_article_head_fts(rowid, title, summary)
+        VALUES (new.id, new.title, new.summary);
+    END
+    """,
+    "INSERT INTO education_article_head_fts(education_article_head_fts) VALUES ('rebuild')",
+    # Covers the is_published/category filter on head matches, which would
+    # otherwise read each article row, content and all (overflow pages)
+    'CREATE INDEX education_article_search_filter_idx ON education_article (id, is_published, category)',
+]
+SQLITE_BACKWARD = [
+    'DROP INDEX IF EXISTS education_article_search_filter_idx',
+    'DROP TRIGGER IF EXISTS education_article_head_fts_update',
+    'DROP TRIGGER IF EXISTS education_article_head_fts_delete',
+    'DROP TRIGGER IF EXISTS education_article_head_fts_insert',
+    'DROP TABLE IF EXISTS education_article_head_fts',
+]
+
+STATEMENTS = {
+    'postgresql': (POSTGRES_FORWARD, POSTGRES_BACKWARD),
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+}
+
+
+def _run(schema_editor, direction):
+    for sql in STATEMENTS.get(schema_editor.connection.vendor, ((), ()))[direction]:
+        schema_editor.execute(sql)
+
+
+def create_head_index(apps, schema_editor):
+    _run(schema_editor, 0)
+
+
+def drop_head_index(apps, schema_editor):
+    _run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('education', '0002_article_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_head_index, drop_head_index),
+    ]
@@ -0,0 +1,259 @@
+"""
+Full-text search over published articles
+
+The index lives in the database and is maintained by the database on every
+write (see migrations 0002 and 0003), so admin saves, bulk imports and queryset
+updates are all indexed incrementally:
+
+- PostgreSQL: a stored generated tsvector column, education_article.search_vector
+  (title weighted A, summary B, content C), with a GIN index.
+- SQLite (dev): an FTS5 table, education_article_fts, kept in sync with
+  education_article by triggers. Title, summary and content are weighted
+  10/5/1 in bm25.
+
+Other backends fall back to an unranked icontains scan.
+
+Results are plain dicts, best match first, in two tiers:
+
+1. Articles matching in their title and summary, ranked on those two fields
+   through a second, much smaller index (migration 0003).
+2. Articles matching only in the content, ranked on all three fields.
+
+A page ranks the second tier only when it runs past the first, so broad
+queries rank the few thousand title/summary matches rather than every
+article that mentions the words. rank is comparable within a tier. The
+snippet is HTML-escaped article text with the matched terms wrapped in
+<mark>.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+
+from .models import Article
+
+# Must match the text search configuration of the generated column
+SEARCH_CONFIG = 'english'
+SNIPPET_WORDS = 24
+MAX_QUERY_TERMS = 10
+
+# Private-use characters mark matches in raw snippets; swapped for <mark>
+# only after the snippet text has been escaped
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+ELLIPSIS = '…'
+
+RESULT_COLUMNS = ('id', 'title', 'slug', 'category', 'summary', 'rank', 'snippet')
+
+POSTGRES_SQL = f"""
+    WITH q AS (SELECT websearch_to_tsquery(%(config)s, %(query)s) AS query),
+    hits AS ({{hits}})
+    SELECT a.id, a.title, a.slug, a.category, a.summary, hits.rank,
+           ts_headline(%(config)s, a.content, q.query, %(headline)s)
+    FROM hits
+    JOIN education_article a ON a.id = hits.id
+    CROSS JOIN q
+    ORDER BY hits.rank DESC, a.id DESC
+"""
+POSTGRES_HITS = {
+    'head': """
+        SELECT article.id, ts_rank(article.head_vector, q.query) AS rank
+        FROM education_article article, q
+        WHERE article.head_vector @@ q.query AND article.is_published {category}
+        ORDER BY rank DESC, article.id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """,
+    'content': """
+        SELECT article.id, ts_rank(article.search_vector, q.query) AS rank
+        FROM education_article article, q
+        WHERE article.search_vector @@ q.query AND NOT (article.head_vector @@ q.query)
+            AND article.is_published {category}
+        ORDER BY rank DESC, article.id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """,
+}
+POSTGRES_HEAD_COUNT = """
+    SELECT count(*)
+    FROM education_article article, websearch_to_tsquery(%(config)s, %(query)s) q(query)
+    WHERE article.head_vector @@ q.query AND article.is_published {category}
+"""
+POSTGRES_HEADLINE = (
+    f'StartSel="{MARK_START}", StopSel="{MARK_END}", MaxWords={SNIPPET_WORDS}, MinWords=10, '
+    f'MaxFragments=2, FragmentDelimiter=" {ELLIPSIS} "'
+)
+
+# bm25 is negative (lower is better); rank is reported as -bm25. CROSS JOIN
+# keeps hits as the outer loop, so each snippet is an FTS5 rowid lookup
+# rather than a second scan of every match.
+SQLITE_SQL = f"""
+    WITH hits AS ({{hits}})
+    SELECT a.id, a.title, a.slug, a.category, a.summary, -hits.rank,
+           snippet(education_article_fts, -1, %(mark_start)s, %(mark_end)s, %(ellipsis)s, {SNIPPET_WORDS})
+    FROM hits
+    CROSS JOIN education_article_fts ON education_article_fts.rowid = hits.id
+    JOIN education_article a ON a.id = hits.id
+    WHERE education_article_fts MATCH %(match)s
+    ORDER BY hits.rank, a.id DESC
+"""
+SQLITE_HITS = {
+    'head': """
+        SELECT head.rowid AS id, head.rank AS rank
+        FROM education_article_head_fts head
+        JOIN education_article a INDEXED BY education_article_search_filter_idx ON a.id = head.rowid
+        WHERE education_article_head_fts MATCH %(match)s AND a.is_published {category}
+        ORDER BY rank, id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """,
+    'content': """
+        SELECT fts.rowid AS id, fts.rank AS rank
+        FROM education_article_fts fts
+        JOIN education_article a ON a.id = fts.rowid
+        WHERE education_article_fts MATCH %(match)s AND a.is_published {category}
+            AND fts.rowid NOT IN (
+                SELECT rowid FROM education_article_head_fts WHERE education_article_head_fts MATCH %(match)s
+            )
+        ORDER BY rank, id DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+    """,
+}
+SQLITE_HEAD_COUNT = """
+    SELECT count(*)
+    FROM education_article_head_fts head
+    JOIN education_article a INDEXED BY education_article_search_filter_idx ON a.id = head.rowid
+    WHERE education_article_head_fts MATCH %(match)s AND a.is_published {category}
+"""
+
+
+def _highlight(snippet):
+    return escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _rows(rows):
+    return [dict(zip(RESULT_COLUMNS, row), snippet=_highlight(row[-1])) for row in rows]
+
+
+def fts5_query(query):
+    """
+    User text -> FTS5 MATCH expression in which every word must match, like
+    websearch_to_tsquery. Words are quoted, so FTS5 operators and
+    punctuation in the input are never interpreted.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def _tiered(search, count_head, limit, offset):
+    """
+    Page over title/summary matches followed by content-only matches.
+    search(tier, limit, offset) returns ranked rows of one tier.
+    """
+    rows = search('head', limit, offset)
+    if len(rows) < limit:
+        # The page runs past the first tier; its size is known unless the
+        # page started beyond it
+        head_total = offset + len(rows) if rows or not offset else count_head()
+        rows += search('content', limit - len(rows), max(offset - head_total, 0))
+    return rows
+
+
+def _execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_postgres(query, category, limit, offset):
+    params = {'config': SEARCH_CONFIG, 'query': query, 'headline': POSTGRES_HEADLINE, 'category': category}
+    category_sql = 'AND article.category = %(category)s' if category else ''
+
+    def search(tier, limit, offset):
+        hits = POSTGRES_HITS[tier].format(category=category_sql)
+        return _rows(_execute(POSTGRES_SQL.format(hits=hits), dict(params, limit=limit, offset=offset)))
+
+    def count_head():
+        return _execute(POSTGRES_HEAD_COUNT.format(category=category_sql), params)[0][0]
+
+    return _tiered(search, count_head, limit, offset)
+
+
+def _search_sqlite(query, category, limit, offset):
+    match = fts5_query(query)
+    if not match:
+        return []
+    params = {
+        'match': match, 'category': category,
+        'mark_start': MARK_START, 'mark_end': MARK_END, 'ellipsis': ELLIPSIS,
+    }
+    category_sql = 'AND a.category = %(category)s' if category else ''
+
+    def search(tier, limit, offset):
+        hits = SQLITE_HITS[tier].format(category=category_sql)
+        return _rows(_execute(SQLITE_SQL.format(hits=hits), dict(params, limit=limit, offset=offset)))
+
+    def count_head():
+        return _execute(SQLITE_HEAD_COUNT.format(category=category_sql), params)[0][0]
+
+    return _tiered(search, count_head, limit, offset)
+
+
+def _search_fallback(query, category, limit, offset):
+    articles = Article.objects.filter(is_published=True, content__icontains=query)
+    if category:
+        articles = articles.filter(category=category)
+    return [
+        dict(article, rank=None, snippet=escape(article['summary']))
+        for article in articles.values('id', 'title', 'slug', 'category', 'summary')[offset:offset + limit]
+    ]
+
+
+def search_articles(query, category=None, limit=10, offset=0):
+    """
+    Published articles matching query, best match first:
+    [{'id', 'title', 'slug', 'category', 'summary', 'rank', 'snippet'}]
+    """
+    query = query.strip()
+    if not query:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(query, category, limit, offset)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(query, category, limit, offset)
+    return _search_fallback(query, category, limit, offset)
+
+
+def matching_articles(query):
+    """
+    Subquery of the ids of every article (published or not) matching query,
+    for Article.objects.filter(pk__in=...); None when there is no index
+    """
+    query = query.strip()
+    if connection.vendor == 'postgresql':
+        return RawSQL(
+            'SELECT id FROM education_article WHERE search_vector @@ websearch_to_tsquery(%s, %s)',
+            (SEARCH_CONFIG, query),
+        )
+    if connection.vendor == 'sqlite':
+        match = fts5_query(query)
+        if not match:
+            return Article.objects.none().values('pk')
+        return RawSQL(
+            'SELECT rowid FROM education_article_fts WHERE education_article_fts MATCH %s', (match,),
+        )
+    return None
+
+
+def optimize_index():
+    """
+    Merge the index into its most compact form. FTS5 accumulates segments as
+    articles are written one at a time (and GIN a pending list), which slows
+    ranking and snippets until merged.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT gin_clean_pending_list('education_article_search_idx'::regclass)")
+            cursor.execute("SELECT gin_clean_pending_list('education_article_head_idx'::regclass)")
+            cursor.execute('ANALYZE education_article')
+        elif connection.vendor == 'sqlite':
+            cursor.execute("INSERT INTO education_article_fts(education_article_fts) VALUES ('optimize')")
+            cursor.execute("INSERT INTO education_article_head_fts(education_article_head_fts) VALUES ('optimize')")
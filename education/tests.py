@@ -0,0 +1,166 @@
+from django.contrib import admin
+from django.db.models.expressions import RawSQL
+from django.test import RequestFactory, TestCase
+
+from .admin import ArticleAdmin
+from .models import Article
+from .search import matching_articles, search_articles
+
+
+def make_article(slug, title='Feeding note', summary='Daily feeding', content='Kibble and rice.', **fields):
+    return Article.objects.create(
+        slug=slug, title=title, summary=summary, content=content, category=fields.pop('category', 'nutrition'),
+        **fields,
+    )
+
+
+def slugs(results):
+    return [result['slug'] for result in results]
+
+
+class SearchRankingTests(TestCase):
+
+    def test_best_match_wins_over_newer_matches(self):
+        best = Article.objects.create(
+            title='Salmon for dogs', slug='salmon', category='nutrition',
+            summary='Why salmon oil helps', content='Salmon is rich in omega-3. Salmon skin treats.',
+        )
+        Article.objects.bulk_create(
+            Article(
+                title=f'Feeding note {i}', slug=f'note-{i}', category='nutrition', summary='Daily feeding',
+                content='Kibble, rice and chicken. ' * 20 + 'Some dogs also like salmon.',
+            )
+            for i in range(1500)
+        )
+
+        results = search_articles('salmon', limit=3)
+        self.assertEqual(results[0]['id'], best.pk)
+        self.assertIn('<mark>', results[0]['snippet'])
+
+    def test_title_and_summary_matches_come_before_content_matches(self):
+        make_article('content-heavy', content='Salmon salmon salmon. ' * 30)
+        make_article('summary', summary='Salmon for senior dogs')
+        make_article('title', title='Salmon')
+        make_article('content-light', content='Kibble. ' * 30 + 'Salmon once.')
+
+        self.assertEqual(slugs(search_articles('salmon')), ['title', 'summary', 'content-heavy', 'content-light'])
+
+    def test_pages_run_on_from_the_first_tier_into_the_second(self):
+        for i in range(3):
+            make_article(f'head-{i}', title=f'Salmon note {i}')
+        for i in range(4):
+            make_article(f'body-{i}', content=f'Kibble. {"Salmon. " * (i + 1)}')
+        everything = slugs(search_articles('salmon', limit=20))
+        self.assertEqual(len(everything), 7)
+
+        for offset in range(8):
+            for limit in (1, 2, 5):
+                with self.subTest(offset=offset, limit=limit):
+                    page = slugs(search_articles('salmon', limit=limit, offset=offset))
+                    self.assertEqual(page, everything[offset:offset + limit])
+
+    def test_all_words_must_match(self):
+        make_article('both', title='Grain free diets')
+        make_article('one', title='Grain and rice')
+        make_article('split', title='Grain basics', content='A free feeding schedule.')
+
+        self.assertEqual(sorted(slugs(search_articles('grain free'))), ['both', 'split'])
+
+    def test_stemming_and_operators(self):
+        make_article('puppies', title='Feeding puppies')
+        self.assertEqual(slugs(search_articles('puppy')), ['puppies'])
+        # FTS5 syntax in the query is matched as plain words
+        self.assertEqual(search_articles('puppy OR NOT "kibble*'), [])
+        self.assertEqual(search_articles('  '), [])
+
+    def test_unpublished_articles_and_other_categories_are_hidden(self):
+        make_article('published', title='Salmon oil')
+        make_article('draft', title='Salmon oil draft', is_published=False)
+        make_article('health', title='Salmon allergies', category='health')
+
+        self.assertEqual(sorted(slugs(search_articles('salmon'))), ['health', 'published'])
+        self.assertEqual(slugs(search_articles('salmon', category='health')), ['health'])
+
+
+class SearchSnippetTests(TestCase):
+
+    def test_article_html_is_escaped_and_matches_are_marked(self):
+        make_article(
+            'xss', title='Treats',
+            content='Good treats <script>alert("salmon")</script> & rewards: salmon jerky <b>daily</b>.',
+        )
+        snippet = search_articles('salmon')[0]['snippet']
+
+        self.assertNotIn('<script>', snippet)
+        self.assertNotIn('<b>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+        self.assertIn('&amp; rewards', snippet)
+        self.assertIn('<mark>salmon</mark> jerky', snippet)
+
+
+class SearchIndexSyncTests(TestCase):
+    """The database triggers keep both indexes in step with every write"""
+
+    def test_saves_and_queryset_updates_are_indexed(self):
+        article = make_article('moved', title='Salmon basics')
+        article.title = 'Beef basics'
+        article.save()
+        self.assertEqual(search_articles('salmon'), [])
+        self.assertEqual(slugs(search_articles('beef')), ['moved'])
+
+        Article.objects.filter(pk=article.pk).update(summary='Lamb and rice', content='Venison stew.')
+        self.assertEqual(slugs(search_articles('lamb')), ['moved'])
+        self.assertEqual(slugs(search_articles('venison')), ['moved'])
+        self.assertEqual(search_articles('kibble'), [])
+
+    def test_a_title_edit_moves_an_article_between_tiers(self):
+        make_article('other', title='Salmon oil')
+        article = make_article('edited', content='Salmon salmon salmon.')
+        self.assertEqual(slugs(search_articles('salmon')), ['other', 'edited'])
+
+        Article.objects.filter(pk=article.pk).update(title='Salmon salmon')
+        self.assertEqual(slugs(search_articles('salmon'))[0], 'edited')
+
+    def test_publishing_needs_no_reindex(self):
+        article = make_article('draft', title='Salmon oil', is_published=False)
+        self.assertEqual(search_articles('salmon'), [])
+        Article.objects.filter(pk=article.pk).update(is_published=True)
+        self.assertEqual(slugs(search_articles('salmon')), ['draft'])
+
+    def test_deletes_are_removed_from_the_index(self):
+        make_article('kept', title='Salmon oil')
+        make_article('deleted', title='Salmon skin', content='Salmon.')
+        Article.objects.filter(slug='deleted').delete()
+
+        self.assertEqual(slugs(search_articles('salmon')), ['kept'])
+        self.assertEqual(list(Article.objects.filter(pk__in=matching_articles('skin'))), [])
+
+
+class ArticleAdminSearchTests(TestCase):
+
+    def setUp(self):
+        self.model_admin = ArticleAdmin(Article, admin.site)
+        self.request = RequestFactory().get('/admin/education/article/')
+
+    def search(self, term):
+        return self.model_admin.get_search_results(self.request, Article.objects.all(), term)
+
+    def test_searches_the_index_including_drafts(self):
+        make_article('published', title='Puppies and salmon')
+        make_article('draft', content='More about puppies.', is_published=False)
+        make_article('other', title='Beef')
+
+        queryset, may_have_duplicates = self.search('puppy')
+        self.assertFalse(may_have_duplicates)
+        self.assertEqual(sorted(queryset.values_list('slug', flat=True)), ['draft', 'published'])
+        self.assertIn('education_article_fts', str(queryset.query))
+
+    def test_matching_articles_is_a_subquery(self):
+        self.assertIsInstance(matching_articles('salmon oil'), RawSQL)
+
+    def test_blank_and_punctuation_only_terms(self):
+        make_article('any', title='Salmon')
+        queryset, _ = self.search('')
+        self.assertEqual(queryset.count(), 1)
+        queryset, _ = self.search('***')
+        self.assertEqual(queryset.count(), 0)
@@ -1,28 +1,36 @@
 from django.contrib import admin
-from .models import Product, Meal, PetProfile, SavedMeal
-from django.utils.html import format_html
+from .models import Product, PackageVariant, ProductPrice, Meal, PetProfile, SavedMeal, ClickRollup, RecommendationRollup
+from django.template.loader import render_to_string
+
+
+class PackageVariantInline(admin.TabularInline):
+    model = PackageVariant
+    extra = 1
+    fields = ['package_size', 'price', 'is_active']
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['brand', 'name', 'product_type', 'package_size', 'package_unit', 'price', 'image_preview', 'is_active']  # Added image_preview
     list_filter = ['product_type', 'brand', 'is_active', 'preferences']
-    search_fields = ['brand', 'name']
+    search_fields = ['brand', 'name', 'sku']
     list_editable = ['price', 'is_active']
 
     # Add image preview in the list
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" height="50" />', obj.image.url)
+            # Resized copies through srcset, not the full upload
+            return render_to_string('meals/product_image.html', {'product': obj, 'width': 50, 'sizes': '50px'})
         return "No image"
     image_preview.short_description = 'Image'
     
     readonly_fields = ['image_preview']
+    inlines = [PackageVariantInline]
     
     # Organize fields to match your Chewy workflow
     fieldsets = (
         ('Product Info (from Chewy)', {
-            'fields': ('brand', 'name', 'product_type'),
+            'fields': ('brand', 'name', 'product_type', 'sku'),
             'description': 'Copy brand and product name from Chewy'
         }),
         ('Product Image', {
@@ -55,6 +63,21 @@ class ProductAdmin(admin.ModelAdmin):
         return initial
 
 
+@admin.register(ProductPrice)
+class ProductPriceAdmin(admin.ModelAdmin):
+    """Read-only price history; rows come from price edits and `manage.py refresh_prices`"""
+    list_display = ['recorded_at', 'product', 'price']
+    list_select_related = ['product']
+    search_fields = ['product__brand', 'product__name', 'product__sku']
+    date_hierarchy = 'recorded_at'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Meal)
 class MealAdmin(admin.ModelAdmin):
     list_display = [
@@ -116,4 +139,30 @@ class SavedMealAdmin(admin.ModelAdmin):
     list_display = ['user', 'pet', 'meal', 'daily_calories', 'is_current', 'created_at']
     list_filter = ['is_current', 'created_at']
     search_fields = ['user__username', 'pet__name', 'meal__brand']
-    readonly_fields = ['daily_calories', 'dry_food_oz', 'wet_food_oz', 'treat_oz', 'created_at']
\ No newline at end of file
+    readonly_fields = ['daily_calories', 'dry_food_oz', 'wet_food_oz', 'treat_oz', 'created_at']
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """Read-only analytics; fed by `manage.py rollup_events`, never by raw events"""
+    list_filter = ['granularity', 'size_category', 'brand']
+    date_hierarchy = 'period_start'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ClickRollup)
+class ClickRollupAdmin(RollupAdmin):
+    list_display = ['period_start', 'granularity', 'brand', 'product', 'size_category', 'clicks']
+    list_select_related = ['product']
+    search_fields = ['brand', 'product__name']
+
+
+@admin.register(RecommendationRollup)
+class RecommendationRollupAdmin(RollupAdmin):
+    list_display = ['period_start', 'granularity', 'brand', 'meal', 'size_category', 'impressions']
+    list_select_related = ['meal']
+    search_fields = ['brand', 'meal__name']
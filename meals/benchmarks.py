@@ -0,0 +1,236 @@
+"""
+Benchmarks behind `manage.py benchmark`
+
+Each benchmark returns rows of (label, value, unit), so later changes can be
+measured against the numbers quoted when a feature landed. Inputs come from
+a seeded random generator, so two runs on the same machine measure the same
+work. Request benchmarks replay pages with the test client against sample
+data created in a transaction that is rolled back afterwards, with a private
+cache and analytics events switched off, so the database and shared caches
+are left as they were.
+"""
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from statistics import median
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .events import click_buffer, recommendation_buffer
+from .meal_calculator import SUPPLY_HORIZONS, calculate_portions, calculate_supply, package_table
+from .models import Meal, PackageVariant, PetProfile, Product, SavedMeal
+from .plans import rank_candidates
+
+SEED = 2024
+# Package sizes (lbs) and prices a catalog typically offers
+PACKAGE_SIZES = ('0.75', '2.2', '4', '4.5', '6', '12', '15', '24', '30', '33.5')
+
+
+def _timed(func, repeat):
+    """Median seconds per call of func over repeat runs"""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return median(times)
+
+
+def _package_options(rng):
+    """(package_size, price) options for one product: its own package and 0-2 variants"""
+    sizes = rng.sample(PACKAGE_SIZES, rng.choice((1, 1, 2, 3)))
+    return tuple(
+        (Decimal(size), (Decimal(size) * Decimal(rng.uniform(1.6, 4.5))).quantize(Decimal('0.01')))
+        for size in sizes
+    )
+
+
+def _meal_rows(rng, count):
+    """Candidate rows shaped like Meal.objects.candidates().values(*COST_COLUMNS)"""
+    rows, variants = [], {}
+    for meal_id in range(1, count + 1):
+        row = {'id': meal_id, 'is_featured': meal_id % 7 == 0, 'brand': f'Brand {meal_id % 5}'}
+        for slot, prefix, offset in (('dry_food', 'dry', 0), ('wet_food', 'wet', 1), ('treats', 'treat', 2)):
+            product_id = meal_id * 3 + offset
+            (size, price), *extra = _package_options(rng)
+            row.update({f'{slot}_id': product_id, f'{prefix}_package_size': size, f'{prefix}_price': price})
+            if extra:
+                variants[product_id] = tuple(extra)
+        rows.append(row)
+    return rows, variants
+
+
+def package_benchmark(meals=200, repeat=20):
+    """
+    Package optimizer cost per meal (three products): building the tables
+    from scratch, then costing with warm tables as every later request does
+    """
+    rng = random.Random(SEED)
+    rows, variants = _meal_rows(rng, meals)
+    supplies = [
+        calculate_supply(weight, 'moderate', 'adult', days)
+        for weight in (5, 20, 45, 80, 150, 300) for days in SUPPLY_HORIZONS
+    ]
+
+    def cold():
+        package_table.cache_clear()
+        rank_candidates(rows, supplies[-1], variants)
+
+    def warm():
+        for supply in supplies:
+            rank_candidates(rows, supply, variants)
+
+    cold_seconds = _timed(cold, repeat)
+    warm_seconds = _timed(warm, repeat)
+    return [
+        ('meals costed', meals, ''),
+        ('cold tables, per meal', cold_seconds / meals * 1e6, 'us'),
+        ('warm tables, per meal', warm_seconds / (meals * len(supplies)) * 1e6, 'us'),
+    ]
+
+
+# --- Request benchmarks ----------------------------------------------------
+
+PRIVATE_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+}
+# The settings before cookie messages and cached_db sessions
+DB_SESSIONS = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+}
+
+
+def _product(rng, product_type, number, calories_per_oz):
+    size = Decimal(rng.choice(PACKAGE_SIZES))
+    return Product.objects.create(
+        brand=f'Brand {number % 5}', name=f'Benchmark {product_type} {number}', product_type=product_type,
+        calories_per_oz=calories_per_oz, package_size=size,
+        price=(size * Decimal(rng.uniform(1.6, 4.5))).quantize(Decimal('0.01')),
+        affiliate_link=f'https://example.com/benchmark/{product_type}/{number}',
+    )
+
+
+@contextmanager
+def sample_data(meals=30):
+    """
+    Yield a user with three pets and saved meals, next to `meals` medium
+    adult meals (a quarter with package variants), all rolled back on exit
+    """
+    rng = random.Random(SEED)
+    with transaction.atomic(), override_settings(CACHES=PRIVATE_CACHE, ALLOWED_HOSTS=['testserver']):
+        click_buffer.enabled = recommendation_buffer.enabled = False
+        try:
+            created = []
+            for number in range(meals):
+                dry = _product(rng, 'dry', number, Decimal('95'))
+                created.append(Meal.objects.create(
+                    name=f'Benchmark meal {number}', brand=dry.brand, dry_food=dry,
+                    wet_food=_product(rng, 'wet', number, Decimal('25')),
+                    treats=_product(rng, 'treat', number, Decimal('87.5')),
+                    size_category='medium', life_stage='adult', is_featured=number % 5 == 0,
+                    reference_daily_calories=1000, reference_dry_oz=Decimal('10'),
+                    reference_wet_oz=Decimal('5'), reference_treat_oz=Decimal('1'),
+                ))
+                if number % 4 == 0:
+                    PackageVariant.objects.create(product=dry, package_size=Decimal('4'), price=Decimal('9.99'))
+
+            user = User.objects.create_user('benchmark')
+            for number, weight in enumerate((30, 45, 60)):
+                pet = PetProfile.objects.create(
+                    user=user, name=f'Dog {number}', weight=weight, age_months=36, life_stage='adult',
+                )
+                SavedMeal.objects.create(
+                    user=user, pet=pet, meal=created[number],
+                    **SavedMeal.portion_values(calculate_portions(pet.weight, pet.activity_level, pet.life_stage)),
+                )
+            yield user
+        finally:
+            click_buffer.enabled = recommendation_buffer.enabled = True
+            transaction.set_rollback(True)
+
+
+def _queries(client, path, params=None):
+    """Queries of the second request for path (the first warms the caches)"""
+    client.get(path, params, secure=True)
+    with CaptureQueriesContext(connection) as queries:
+        client.get(path, params, secure=True)
+    return len(queries)
+
+
+def query_benchmark(repeat=None):
+    """
+    Database queries per request, anonymous and logged in, with the
+    configured session and message storage and with database sessions and
+    session-backed messages
+    """
+    rows = []
+    with sample_data() as user:
+        for name, overrides in (('configured', {}), ('db sessions', DB_SESSIONS)):
+            with override_settings(**overrides):
+                anonymous, member = Client(), Client()
+                member.force_login(user)
+                rows += [
+                    (f'{name}: anonymous home', _queries(anonymous, '/'), 'queries'),
+                    (f'{name}: anonymous results', _queries(anonymous, '/results/', {'weight': 40}), 'queries'),
+                    (f'{name}: anonymous invalid weight', _queries(anonymous, '/results/', {'weight': 'x'}),
+                     'queries'),
+                    (f'{name}: logged-in dashboard', _queries(member, '/accounts/dashboard/'), 'queries'),
+                    (f'{name}: logged-in results', _queries(member, '/results/', {'weight': 40}), 'queries'),
+                    (f'{name}: logged-in household', _queries(member, '/accounts/household/'), 'queries'),
+                ]
+    return rows
+
+
+def _uncached_loader_templates():
+    """TEMPLATES with explicit, uncached loaders (every render re-parses)"""
+    templates = []
+    for engine in settings.TEMPLATES:
+        options = dict(engine.get('OPTIONS', {}), loaders=[
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])
+        templates.append(dict(engine, APP_DIRS=False, OPTIONS=options))
+    return templates
+
+
+def render_benchmark(repeat=20):
+    """
+    Median milliseconds per page for a logged-in user (so whole-page caching
+    is skipped), with the configured cache and template loader, without a
+    cache (no meal card or featured fragments) and with an uncached loader
+    """
+    dummy_cache = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    rows = []
+    with sample_data() as user:
+        meal_id = Meal.objects.filter(name__startswith='Benchmark').values_list('pk', flat=True).first()
+        pages = (
+            ('home', lambda i: ('/', None)),
+            ('results, weight varies', lambda i: ('/results/', {'weight': 30 + i % 30})),
+            ('results, same dog', lambda i: ('/results/', {'weight': 40})),
+            ('meal detail', lambda i: (f'/meal/{meal_id}/', {'weight': 40})),
+        )
+        configs = (
+            ('configured', {}),
+            ('no cache', {'CACHES': dummy_cache}),
+            ('uncached loader', {'TEMPLATES': _uncached_loader_templates()}),
+        )
+        for name, overrides in configs:
+            with override_settings(**overrides):
+                client = Client()
+                client.force_login(user)
+                for page, request in pages:
+                    client.get(*request(0), secure=True)
+                    times = []
+                    for i in range(repeat):
+                        path, params = request(i)
+                        started = time.perf_counter()
+                        client.get(path, params, secure=True)
+                        times.append(time.perf_counter() - started)
+                    rows.append((f'{name}: {page}', median(times) * 1e3, 'ms'))
+    return rows
@@ -0,0 +1,163 @@
+"""
+Response caching for catalog-driven pages
+
+Cached pages are keyed on the normalized dog parameters plus a global
+catalog version. Saving or deleting a Product or Meal bumps the version
+(see signals.py), so stale pages are simply never looked up again. Household
+plans are versioned the same way per user, on pet and saved meal changes.
+"""
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+CATALOG_VERSION_KEY = 'meals:catalog_version'
+CATALOG_MODIFIED_KEY = 'meals:catalog_modified'
+HOUSEHOLD_VERSION_KEY = 'meals:household_version:{}'
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so an evicted version never reuses an old number
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_catalog_version():
+    """Current catalog version, created on first use"""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog page"""
+    _bump_version(CATALOG_VERSION_KEY)
+    cache.set(CATALOG_MODIFIED_KEY, timezone.now(), None)
+
+
+def get_household_version(user_id):
+    """Version of a user's pets and saved meals, for caching their household plan"""
+    return _get_version(HOUSEHOLD_VERSION_KEY.format(user_id))
+
+
+def bump_household_version(user_id):
+    """Invalidate a user's cached household plan"""
+    _bump_version(HOUSEHOLD_VERSION_KEY.format(user_id))
+
+
+def get_catalog_last_modified():
+    """Time of the newest Product/Meal change"""
+    modified = cache.get(CATALOG_MODIFIED_KEY)
+    if modified is None:
+        from .models import Meal, Product
+
+        stamps = [
+            Product.objects.aggregate(latest=Max('updated_at'))['latest'],
+            Meal.objects.aggregate(latest=Max('updated_at'))['latest'],
+        ]
+        modified = max((s for s in stamps if s), default=timezone.now())
+        cache.add(CATALOG_MODIFIED_KEY, modified, None)
+    return modified
+
+
+def get_affiliate_link(product_id):
+    """Product's affiliate URL (None if it doesn't exist), cached per catalog version"""
+    key = f'meals:link:{get_catalog_version()}:{product_id}'
+    link = cache.get(key)
+    if link is None:
+        from .models import Product
+
+        link = Product.objects.filter(pk=product_id).values_list('affiliate_link', flat=True).first() or ''
+        cache.set(key, link, PAGE_CACHE_TIMEOUT)
+    return link or None
+
+
+def _is_shared_page(request):
+    """Anonymous GETs with no pending messages render the same for everyone"""
+    return (request.method in ('GET', 'HEAD') and not request.user.is_authenticated
+            and not len(messages.get_messages(request)))
+
+
+def _page_key(view, params):
+    digest = md5(repr(params).encode(), usedforsecurity=False).hexdigest()
+    return f'{view.__name__}:{get_catalog_version()}:{digest}'
+
+
+def cache_catalog_page(key_func):
+    """
+    Cache a view's response per catalog version
+
+    key_func(request, *args, **kwargs) returns the normalized parameters the
+    page depends on. Only anonymous GETs with no pending messages are cached,
+    since those pages are identical for every visitor.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != 'GET' or not _is_shared_page(request):
+                return view(request, *args, **kwargs)
+
+            try:
+                params = key_func(request, *args, **kwargs)
+            except ValueError:
+                return view(request, *args, **kwargs)
+
+            key = 'meals:page:' + _page_key(view, params)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    cache.set(key, response, PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapped
+    return decorator
+
+
+def conditional_catalog_page(key_func):
+    """
+    Answer If-None-Match/If-Modified-Since with 304 for catalog pages
+
+    The strong ETag covers the view, its normalized parameters and the
+    catalog version; Last-Modified is the newest catalog change. Both are
+    checked before the view runs any portion math or rendering.
+    """
+    def decorator(view):
+        def etag(request, *args, **kwargs):
+            return _page_key(view, key_func(request, *args, **kwargs))
+
+        def last_modified(request, *args, **kwargs):
+            return get_catalog_last_modified()
+
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _is_shared_page(request):
+                return view(request, *args, **kwargs)
+
+            try:
+                key_func(request, *args, **kwargs)
+            except ValueError:
+                return view(request, *args, **kwargs)
+
+            response = conditional_view(request, *args, **kwargs)
+            # Browsers must revalidate so a price change shows up immediately
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,444 @@
+"""
+Streaming catalog import/export (CSV or JSONL)
+
+Rows are read one at a time and written to the database in batches with
+bulk_create/bulk_update, one transaction per batch, so memory stays flat no
+matter how large the feed is. Products are matched on sku; meals on id, with
+their products referenced by sku. Price feeds (sku, price) only touch the
+products whose price actually changed, and every change is appended to the
+ProductPrice history.
+"""
+import csv
+import io
+import json
+import sys
+import time
+import urllib.request
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import (
+    PRODUCT_SNAPSHOT_FIELDS, PRODUCT_SNAPSHOT_SLOTS, Meal, MealTag, Product, ProductPrice,
+    parse_preference_tags,
+)
+
+FORMATS = ('csv', 'jsonl')
+
+PRODUCT_COLUMNS = (
+    'sku', 'brand', 'name', 'product_type', 'calories_per_oz', 'package_size',
+    'package_unit', 'price', 'affiliate_link', 'preferences', 'description', 'is_active',
+)
+MEAL_COLUMNS = (
+    'id', 'name', 'brand', 'dry_food_sku', 'wet_food_sku', 'treats_sku',
+    'size_category', 'life_stage', 'reference_weight', 'reference_daily_calories',
+    'reference_dry_oz', 'reference_wet_oz', 'reference_treat_oz', 'preference_tags',
+    'description', 'is_featured', 'is_active',
+)
+PRICE_COLUMNS = ('sku', 'price')
+
+PRODUCT_TYPES = {key for key, _ in Product.PRODUCT_TYPES}
+SIZE_CATEGORIES = {key for key, _ in Meal.SIZE_CATEGORIES}
+LIFE_STAGES = {key for key, _ in Meal.LIFE_STAGES}
+
+# Upper bounds of the DecimalField(decimal_places=2) columns feeds write
+CENT = Decimal('0.01')
+MAX_PRICE = Decimal('1000000')  # Product.price: max_digits=8
+MAX_PACKAGE_SIZE = Decimal('10000')  # Product.package_size: max_digits=6
+MAX_CALORIES_PER_OZ = Decimal('1000')  # Product.calories_per_oz: max_digits=5
+MAX_REFERENCE_OZ = Decimal('1000')  # Meal.reference_*_oz: max_digits=5
+
+
+class RowError(ValueError):
+    """A feed row that can't be imported"""
+
+
+def open_feed(source):
+    """
+    Open a feed for reading as text: a file path, '-' for stdin, or an
+    http(s) URL (streamed, not downloaded up front)
+    """
+    if source == '-':
+        return sys.stdin
+    if source.startswith(('http://', 'https://')):
+        response = urllib.request.urlopen(source, timeout=60)
+        return io.TextIOWrapper(response, encoding='utf-8', newline='')
+    return open(source, newline='', encoding='utf-8')
+
+
+def detect_format(path, fmt=None):
+    """Explicit format, or guess from the file extension"""
+    fmt = fmt or ('jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv')
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}' (expected {' or '.join(FORMATS)})")
+    return fmt
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, dict) pairs from an open text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, RowError(f'invalid JSON: {e}')
+
+
+def write_rows(stream, fmt, columns, rows):
+    """Write an iterable of tuples (ordered like columns) to a text stream"""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            stream.write(json.dumps(dict(zip(columns, row)), default=str))
+            stream.write('\n')
+            count += 1
+    return count
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# --- Field parsing ---------------------------------------------------------
+
+def _text(row, key, required=False, default=''):
+    value = row.get(key)
+    value = default if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{key} is required')
+    return value
+
+
+def _decimal(row, key):
+    try:
+        value = Decimal(str(row.get(key)).strip())
+    except (InvalidOperation, TypeError):
+        raise RowError(f'{key} must be a number')
+    if not value.is_finite():
+        raise RowError(f'{key} must be a number')
+    return value
+
+
+def _amount(row, key, limit, positive=False):
+    """
+    Decimal rounded to cents that fits a DecimalField(decimal_places=2)
+    below limit; positive rejects 0 (e.g. package sizes)
+    """
+    value = _decimal(row, key)
+    if 0 <= value < limit:
+        value = value.quantize(CENT)
+    if value >= limit or value < 0 or (positive and not value):
+        lowest = 'greater than 0' if positive else 'between 0'
+        raise RowError(f'{key} must be {lowest} and less than {limit}')
+    return value
+
+
+def _int(row, key, default=None):
+    value = row.get(key)
+    if value in (None, '') and default is not None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise RowError(f'{key} must be a whole number')
+
+
+def _bool(row, key, default):
+    value = row.get(key)
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y', 't')
+
+
+def _choice(row, key, choices):
+    value = _text(row, key, required=True)
+    if value not in choices:
+        raise RowError(f"{key} must be one of: {', '.join(sorted(choices))}")
+    return value
+
+
+def parse_product(row):
+    """Validated Product field values from a feed row"""
+    return {
+        'sku': _text(row, 'sku', required=True),
+        'brand': _text(row, 'brand', required=True),
+        'name': _text(row, 'name', required=True),
+        'product_type': _choice(row, 'product_type', PRODUCT_TYPES),
+        'calories_per_oz': _amount(row, 'calories_per_oz', MAX_CALORIES_PER_OZ),
+        'package_size': _amount(row, 'package_size', MAX_PACKAGE_SIZE, positive=True),
+        'package_unit': _text(row, 'package_unit', default='oz') or 'oz',
+        'price': _amount(row, 'price', MAX_PRICE),
+        'affiliate_link': _text(row, 'affiliate_link', required=True),
+        'preferences': _text(row, 'preferences'),
+        'description': _text(row, 'description'),
+        'is_active': _bool(row, 'is_active', True),
+    }
+
+
+def parse_price(row):
+    """Validated (sku, price) from a price feed row"""
+    return {
+        'sku': _text(row, 'sku', required=True),
+        'price': _amount(row, 'price', MAX_PRICE),
+    }
+
+
+def parse_meal(row):
+    """Validated Meal field values from a feed row (products still as skus)"""
+    return {
+        'id': _int(row, 'id', default=0) or None,
+        'name': _text(row, 'name', required=True),
+        'brand': _text(row, 'brand', required=True),
+        'dry_food_sku': _text(row, 'dry_food_sku', required=True),
+        'wet_food_sku': _text(row, 'wet_food_sku', required=True),
+        'treats_sku': _text(row, 'treats_sku', required=True),
+        'size_category': _choice(row, 'size_category', SIZE_CATEGORIES),
+        'life_stage': _choice(row, 'life_stage', LIFE_STAGES),
+        'reference_weight': _int(row, 'reference_weight', default=30),
+        'reference_daily_calories': _int(row, 'reference_daily_calories'),
+        'reference_dry_oz': _amount(row, 'reference_dry_oz', MAX_REFERENCE_OZ),
+        'reference_wet_oz': _amount(row, 'reference_wet_oz', MAX_REFERENCE_OZ),
+        'reference_treat_oz': _amount(row, 'reference_treat_oz', MAX_REFERENCE_OZ),
+        'preference_tags': _text(row, 'preference_tags'),
+        'description': _text(row, 'description'),
+        'is_featured': _bool(row, 'is_featured', False),
+        'is_active': _bool(row, 'is_active', True),
+    }
+
+
+# --- Import ----------------------------------------------------------------
+
+class ImportStats:
+    """Counters and throughput for one import run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def _parse_batch(batch, parse, stats):
+    parsed = {}
+    for line_number, row in batch:
+        stats.rows += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            if not isinstance(row, dict):
+                raise RowError('row must be an object')
+            values = parse(row)
+        except RowError as e:
+            stats.errors.append((line_number, str(e)))
+            continue
+        # Last row wins when a feed repeats a key within a batch
+        parsed[values.get('sku') or values.get('id') or ('new', line_number)] = (line_number, values)
+    return list(parsed.values())
+
+
+def import_products(rows, batch_size=1000, stats=None):
+    """
+    Upsert Products from (line_number, row) pairs, matched on sku
+    Each batch is one INSERT ... ON CONFLICT (sku) DO UPDATE via bulk_create
+    """
+    stats = stats or ImportStats()
+    update_fields = [f for f in PRODUCT_COLUMNS if f != 'sku'] + ['updated_at']
+
+    for batch in batched(rows, batch_size):
+        values = _parse_batch(batch, parse_product, stats)
+        if not values:
+            continue
+        with transaction.atomic():
+            skus = [v['sku'] for _, v in values]
+            old_prices = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'price'))
+            Product.objects.bulk_create(
+                [Product(**v) for _, v in values],
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['sku'],
+                update_fields=update_fields,
+            )
+            # Upserted rows don't get their ids back, so look them up for the history
+            ids = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'pk'))
+            now = timezone.now()
+            ProductPrice.objects.bulk_create(
+                [ProductPrice(product_id=ids[v['sku']], price=v['price'], recorded_at=now)
+                 for _, v in values if old_prices.get(v['sku']) != v['price']],
+                batch_size=batch_size,
+            )
+            existing = {sku: ids[sku] for sku in old_prices}
+            if existing:
+                # bulk writes skip post_save, so refresh the meal snapshots here
+                ids = list(existing.values())
+                Meal.objects.filter(
+                    Q(dry_food__in=ids) | Q(wet_food__in=ids) | Q(treats__in=ids)
+                ).refresh_product_snapshot()
+        stats.created += len(values) - len(existing)
+        stats.updated += len(existing)
+
+    transaction.on_commit(bump_catalog_version)
+    return stats
+
+
+def import_prices(rows, batch_size=5000, stats=None):
+    """
+    Apply a (sku, price) feed from (line_number, row) pairs
+    Prices are diffed against the catalog per batch; only changed products
+    are written (one bulk_update), each change gets a ProductPrice row, and
+    the affected meal snapshots are refreshed. Unchanged rows cost no writes.
+    """
+    stats = stats or ImportStats()
+    changed_any = False
+
+    for batch in batched(rows, batch_size):
+        values = _parse_batch(batch, parse_price, stats)
+        if not values:
+            continue
+        current = {
+            sku: (pk, price) for sku, pk, price in
+            Product.objects.filter(sku__in=[v['sku'] for _, v in values]).values_list('sku', 'pk', 'price')
+        }
+        now = timezone.now()
+        changed = []
+        for line_number, v in values:
+            if v['sku'] not in current:
+                stats.errors.append((line_number, f"unknown product sku: {v['sku']}"))
+                continue
+            pk, price = current[v['sku']]
+            if price == v['price']:
+                stats.unchanged += 1
+                continue
+            changed.append(Product(pk=pk, price=v['price'], updated_at=now))
+        if not changed:
+            continue
+
+        with transaction.atomic():
+            Product.objects.bulk_update(changed, ['price', 'updated_at'], batch_size=batch_size)
+            ProductPrice.objects.bulk_create(
+                [ProductPrice(product_id=p.pk, price=p.price, recorded_at=now) for p in changed],
+                batch_size=batch_size,
+            )
+            # bulk writes skip post_save, so refresh the meal snapshots here
+            ids = [p.pk for p in changed]
+            Meal.objects.filter(
+                Q(dry_food__in=ids) | Q(wet_food__in=ids) | Q(treats__in=ids)
+            ).refresh_product_snapshot()
+        stats.updated += len(changed)
+        changed_any = True
+
+    if changed_any:
+        transaction.on_commit(bump_catalog_version)
+    return stats
+
+
+def reset_id_sequence(model):
+    """Point the model's id sequence past its largest id (no-op on SQLite)"""
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+def import_meals(rows, batch_size=1000, stats=None):
+    """Upsert Meals from (line_number, row) pairs, matched on id"""
+    stats = stats or ImportStats()
+    sku_fields = {f'{fk}_sku': fk for fk in PRODUCT_SNAPSHOT_SLOTS}
+    update_fields = (
+        [f for f in MEAL_COLUMNS if f != 'id' and f not in sku_fields]
+        + list(PRODUCT_SNAPSHOT_SLOTS)
+        + [f'{prefix}_{field}' for prefix in PRODUCT_SNAPSHOT_SLOTS.values()
+           for field in PRODUCT_SNAPSHOT_FIELDS]
+        + ['updated_at']
+    )
+
+    for batch in batched(rows, batch_size):
+        values = _parse_batch(batch, parse_meal, stats)
+        if not values:
+            continue
+        skus = {v[sku_field] for _, v in values for sku_field in sku_fields}
+        products = Product.objects.in_bulk(skus, field_name='sku')
+
+        with transaction.atomic():
+            existing = Meal.objects.in_bulk([v['id'] for _, v in values if v['id']])
+            now = timezone.now()
+            to_create, to_update = [], []
+            for line_number, v in values:
+                missing = [v[f] for f in sku_fields if v[f] not in products]
+                if missing:
+                    stats.errors.append((line_number, f"unknown product sku(s): {', '.join(missing)}"))
+                    continue
+                for sku_field, fk in sku_fields.items():
+                    v[fk] = products[v.pop(sku_field)]
+                meal = existing.get(v['id'])
+                if meal is None:
+                    meal = Meal(**v)
+                    to_create.append(meal)
+                else:
+                    for field, value in v.items():
+                        setattr(meal, field, value)
+                    meal.updated_at = now
+                    to_update.append(meal)
+                meal.copy_product_snapshot()
+
+            # Meals keep the feed's ids, which the id sequence hasn't handed
+            # out; move it past them before any meal gets a generated id
+            with_ids = [meal for meal in to_create if meal.pk]
+            Meal.objects.bulk_create(with_ids, batch_size=batch_size)
+            if with_ids:
+                reset_id_sequence(Meal)
+            Meal.objects.bulk_create([meal for meal in to_create if not meal.pk], batch_size=batch_size)
+            Meal.objects.bulk_update(to_update, update_fields, batch_size=batch_size)
+
+            # bulk operations skip post_save, so rebuild the tag rows here
+            meals = to_create + to_update
+            MealTag.objects.filter(meal__in=to_update).delete()
+            MealTag.objects.bulk_create(
+                [MealTag(meal=meal, tag=tag) for meal in meals
+                 for tag in parse_preference_tags(meal.preference_tags)],
+                batch_size=batch_size,
+            )
+        stats.created += len(to_create)
+        stats.updated += len(to_update)
+
+    transaction.on_commit(bump_catalog_version)
+    return stats
+
+
+# --- Export ----------------------------------------------------------------
+
+def product_rows(chunk_size=2000):
+    return Product.objects.order_by('pk').values_list(*PRODUCT_COLUMNS).iterator(chunk_size=chunk_size)
+
+
+def meal_rows(chunk_size=2000):
+    columns = [f'{c[:-4]}__sku' if c.endswith('_sku') else c for c in MEAL_COLUMNS]
+    return Meal.objects.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
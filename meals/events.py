@@ -0,0 +1,115 @@
+"""
+Buffered analytics event logging (affiliate clicks, recommendations shown)
+
+Views only append a dict to an in-process buffer. A background thread writes
+buffered events with one bulk_create when the buffer reaches
+ANALYTICS_EVENT_BATCH_SIZE or every ANALYTICS_EVENT_FLUSH_INTERVAL seconds,
+and whatever is left is flushed when the process exits.
+"""
+import atexit
+import logging
+import threading
+from collections import deque
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, 'ANALYTICS_EVENT_BATCH_SIZE', 500)
+FLUSH_INTERVAL = getattr(settings, 'ANALYTICS_EVENT_FLUSH_INTERVAL', 5.0)
+# Oldest events are dropped past this if the database stays unreachable
+MAX_BUFFERED = 50000
+
+
+class EventBuffer:
+    """Thread-safe event queue for one model, drained by a daemon writer thread"""
+
+    def __init__(self, model_label, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.model_label = model_label
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._events = deque(maxlen=MAX_BUFFERED)
+        self._wake = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._thread = None
+        # Off while benchmarks replay requests against sample data
+        self.enabled = True
+
+    def record(self, **fields):
+        """Queue one event (model field values); never touches the database"""
+        if not self.enabled:
+            return
+        self._events.append(fields)
+        if self._thread is None:
+            self._start()
+        if len(self._events) >= self.batch_size:
+            self._wake.set()
+
+    def flush(self):
+        """Write every queued event; returns the number written"""
+        model = apps.get_model(self.model_label)
+
+        with self._flush_lock:
+            written = 0
+            while self._events:
+                batch = []
+                while self._events and len(batch) < self.batch_size:
+                    batch.append(self._events.popleft())
+                events = [model(**fields) for fields in batch]
+                try:
+                    try:
+                        with transaction.atomic():
+                            model.objects.bulk_create(events)
+                    except IntegrityError:
+                        # A referenced row was deleted while its events were queued
+                        events = self._drop_orphans(model, events)
+                        model.objects.bulk_create(events)
+                except Exception:
+                    # Keep the batch for the next attempt
+                    self._events.extendleft(reversed(batch))
+                    raise
+                written += len(events)
+            return written
+
+    def _drop_orphans(self, model, events):
+        """Null out dangling nullable FKs and drop events missing a required one"""
+        kept = events
+        for field in model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            ids = {getattr(e, field.attname) for e in kept} - {None}
+            alive = set(field.related_model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+            if field.null:
+                for event in kept:
+                    if getattr(event, field.attname) not in alive:
+                        setattr(event, field.attname, None)
+            else:
+                kept = [e for e in kept if getattr(e, field.attname) in alive]
+        return kept
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'events-{self.model_label}', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write %s events', self.model_label)
+            finally:
+                # The writer thread has its own connection; don't hold it open
+                connection.close()
+
+
+click_buffer = EventBuffer('meals.AffiliateClick')
+recommendation_buffer = EventBuffer('meals.RecommendationEvent')
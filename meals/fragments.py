@@ -0,0 +1,45 @@
+"""
+Cached meal card fragments for the results page
+
+A card (meal, shopping list, package mix and slot costs) only depends on the
+meal, the catalog and the supply quantities it has to cover, so it is cached
+under (catalog version, meal id, days, dry/wet/treat lbs). Dogs of different
+weights that round to the same quantities share cards, and a results page
+fetches all of its cards with one get_many, pricing and rendering only the
+misses. Catalog edits bump the version, so stale cards are never looked up.
+"""
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .cache import PAGE_CACHE_TIMEOUT, get_catalog_version
+from .meal_calculator import SUPPLY_SLOTS, recommend_package_sizes
+
+MEAL_CARD_TEMPLATE = 'meals/meal_card.html'
+
+
+def meal_card_key(meal_id, supply, version):
+    quantities = (supply['days'], *(supply[key] for key in SUPPLY_SLOTS.values()))
+    return f'meals:card:{version}:{meal_id}:' + ':'.join(map(str, quantities))
+
+
+def render_meal_cards(meals, supply, variants):
+    """{meal id: card HTML} for meals covering supply, rendering only uncached cards"""
+    version = get_catalog_version()
+    keys = {meal.id: meal_card_key(meal.id, supply, version) for meal in meals}
+    cached = cache.get_many(list(keys.values()))
+
+    cards, rendered = {}, {}
+    for meal in meals:
+        html = cached.get(keys[meal.id])
+        if html is None:
+            html = render_to_string(MEAL_CARD_TEMPLATE, {
+                'meal': meal,
+                'shopping_list': recommend_package_sizes(supply, meal, variants),
+                'days': supply['days'],
+            })
+            rendered[keys[meal.id]] = html
+        cards[meal.id] = mark_safe(html)
+    if rendered:
+        cache.set_many(rendered, PAGE_CACHE_TIMEOUT)
+    return cards
@@ -0,0 +1,160 @@
+"""
+Household plans: one combined shopping list for all of a user's pets
+
+Each pet is planned with its current saved meal, or the cheapest
+recommendation for it when it has none. All pets are costed in one pass
+(candidate meals once per size/life stage group, variants once), then the
+amount each product has to cover is added up across pets and packed with
+cheapest_packages, so two dogs eating the same kibble share bags.
+
+Plans are plain dicts, cached per user until one of their pets or saved
+meals changes (household version) or the catalog changes (catalog version).
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .cache import PAGE_CACHE_TIMEOUT, get_catalog_version, get_household_version
+from .meal_calculator import (
+    DEFAULT_SUPPLY_DAYS, SUPPLY_SLOTS, calculate_supply, cheapest_packages, get_size_category,
+)
+from .models import PRODUCT_SNAPSHOT_SLOTS, Meal, PetProfile, Product, SavedMeal
+from .plans import COST_COLUMNS, package_variants, product_ids, rank_candidates
+
+PRODUCT_TYPE_ORDER = {key: i for i, (key, _) in enumerate(Product.PRODUCT_TYPES)}
+
+
+def household_plan(user, days=DEFAULT_SUPPLY_DAYS):
+    """Cached combined plan for every pet of user over days"""
+    key = f'meals:household:{user.pk}:{get_household_version(user.pk)}:{get_catalog_version()}:{days}'
+    plan = cache.get(key)
+    if plan is None:
+        plan = build_household_plan(user, days)
+        cache.set(key, plan, PAGE_CACHE_TIMEOUT)
+    return plan
+
+
+def _choose_meals(pets, supplies):
+    """
+    {pet id: (meal id, 'saved' | 'recommended')}; pets without a saved meal
+    get the cheapest candidate for their size and life stage
+    """
+    chosen = {}
+    # Latest current saved meal per pet wins
+    for pet_id, meal_id in SavedMeal.objects.filter(
+        pet__in=[pet['id'] for pet in pets], is_current=True, meal__is_active=True,
+    ).order_by('created_at', 'pk').values_list('pet_id', 'meal_id'):
+        chosen[pet_id] = (meal_id, 'saved')
+
+    groups = defaultdict(list)
+    for pet in pets:
+        if pet['id'] not in chosen:
+            groups[get_size_category(pet['weight']), pet['life_stage']].append(pet)
+    candidates = {
+        group: list(Meal.objects.candidates(*group).values('id', *COST_COLUMNS))
+        for group in groups
+    }
+    variants = package_variants(set().union(*map(product_ids, candidates.values())))
+    for group, members in groups.items():
+        for pet in members:
+            best = rank_candidates(candidates[group], supplies[pet['id']], variants, limit=1)
+            if best:
+                chosen[pet['id']] = (best[0]['id'], 'recommended')
+    return chosen
+
+
+def _product_entry(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'brand': product.brand,
+        'product_type': product.product_type,
+        'package_unit': product.package_unit,
+        'affiliate_link': product.affiliate_link,
+    }
+
+
+def _packages(lbs, product, variants):
+    """(cost, package counts, [{'package_size', 'price', 'quantity'}]) covering lbs"""
+    options = ((product.package_size, product.price),) + variants.get(product.id, ())
+    cost, counts = cheapest_packages(lbs, options)
+    packages = [
+        {'package_size': size, 'price': price, 'quantity': count}
+        for (size, price), count in zip(options, counts) if count
+    ]
+    return cost, sum(counts), packages
+
+
+def build_household_plan(user, days=DEFAULT_SUPPLY_DAYS):
+    """
+    Combined plan for every pet of user:
+    {'days', 'pets': [...], 'shopping_list': [...], 'total_cost',
+     'cost_per_day', 'separate_cost', 'savings'}
+    separate_cost is what buying for each pet on its own would cost.
+    """
+    pets = list(PetProfile.objects.filter(user=user).order_by('name', 'pk').values(
+        'id', 'name', 'weight', 'activity_level', 'life_stage',
+    ))
+    supplies = {
+        pet['id']: calculate_supply(pet['weight'], pet['activity_level'], pet['life_stage'], days)
+        for pet in pets
+    }
+    chosen = _choose_meals(pets, supplies)
+    meals = Meal.objects.select_related(*PRODUCT_SNAPSHOT_SLOTS).in_bulk(
+        {meal_id for meal_id, _ in chosen.values()}
+    )
+    variants = package_variants({
+        getattr(meal, f'{fk}_id') for meal in meals.values() for fk in PRODUCT_SNAPSHOT_SLOTS
+    })
+
+    needed = defaultdict(float)
+    products = {}
+    fed = defaultdict(list)
+    separate_cost = 0
+    pet_plans = []
+    for pet in pets:
+        meal_id, source = chosen.get(pet['id'], (None, None))
+        meal = meals.get(meal_id)
+        supply = supplies[pet['id']]
+        pet_plans.append({
+            **pet,
+            'meal': {'id': meal.id, 'name': meal.name, 'brand': meal.brand} if meal else None,
+            'source': source if meal else None,
+            'supply': {k: v for k, v in supply.items() if k != 'daily_portions'},
+        })
+        if meal is None:
+            continue
+        for slot, supply_key in SUPPLY_SLOTS.items():
+            product = getattr(meal, slot)
+            products[product.id] = product
+            needed[product.id] += supply[supply_key]
+            fed[product.id].append(pet['name'])
+            separate_cost += _packages(supply[supply_key], product, variants)[0]
+
+    shopping_list = []
+    for product_id, lbs in needed.items():
+        product = products[product_id]
+        cost, quantity, packages = _packages(round(lbs, 1), product, variants)
+        shopping_list.append({
+            'product': _product_entry(product),
+            'lbs_needed': round(lbs, 1),
+            'quantity': quantity,
+            'packages': packages,
+            'cost': cost,
+            'pets': fed[product_id],
+        })
+    shopping_list.sort(key=lambda item: (
+        PRODUCT_TYPE_ORDER.get(item['product']['product_type'], len(PRODUCT_TYPE_ORDER)),
+        item['product']['brand'], item['product']['name'],
+    ))
+
+    total_cost = sum((item['cost'] for item in shopping_list), 0)
+    return {
+        'days': days,
+        'pets': pet_plans,
+        'shopping_list': shopping_list,
+        'total_cost': total_cost,
+        'cost_per_day': total_cost / days,
+        'separate_cost': separate_cost,
+        'savings': separate_cost - total_cost,
+    }
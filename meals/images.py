@@ -0,0 +1,174 @@
+"""
+Product image derivatives
+
+Uploads are resized to a few fixed widths, as JPEG and WebP, so the admin's
+product previews load a thumbnail through srcset instead of the original
+upload. Resizing runs in
+a process pool: on upload (queued by the Product post_save signal once the
+transaction commits, so the admin request never waits on Pillow) and in bulk
+from `manage.py build_image_derivatives`. Workers only read and write files;
+the parent records the result on Product.image_derivatives with an UPDATE,
+so no save signals fire again.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (80, 160, 320))
+WORKERS = getattr(settings, 'PRODUCT_IMAGE_WORKERS', 2)
+
+# format key: (Pillow format, file extension, save options)
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+
+def derivative_name(source, width, ext):
+    """products/kibble.png -> products/derived/kibble-160.webp"""
+    path = PurePosixPath(source)
+    return str(path.parent / 'derived' / f'{path.stem}-{width}.{ext}')
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+
+
+def _for_format(image, pil_format):
+    from PIL import Image
+
+    if pil_format == 'JPEG':
+        # No alpha channel in JPEG: flatten onto white
+        if _has_alpha(image):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA' if _has_alpha(image) else 'RGB')
+    return image
+
+
+def render_derivatives(source):
+    """
+    Write every derivative of one stored image and return the
+    Product.image_derivatives value for it. Runs in the worker processes.
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(source, 'rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+
+    derived = {'source': source}
+    for width in DERIVATIVE_WIDTHS:
+        if width < original.width:
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+        else:
+            # Never upscale: the original size is the largest copy
+            resized = original
+        for fmt, (pil_format, ext, options) in FORMATS.items():
+            buffer = BytesIO()
+            _for_format(resized, pil_format).save(buffer, pil_format, **options)
+            name = derivative_name(source, width, ext)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            derived.setdefault(fmt, []).append([resized.width, name])
+        if resized is original:
+            break
+    return derived
+
+
+def record_derivatives(results):
+    """Store {product id: derivatives}, skipping products whose image changed meanwhile"""
+    from .cache import bump_catalog_version
+    from .models import Product
+
+    updated = 0
+    for product_id, derived in results.items():
+        updated += Product.objects.filter(pk=product_id, image=derived['source']).update(
+            image_derivatives=derived,
+        )
+    if updated:
+        transaction.on_commit(bump_catalog_version)
+    return updated
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def make_pool(workers=WORKERS):
+    # spawn, not fork: the web process has writer threads (and possibly held
+    # locks) that must not be copied into the workers
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = make_pool()
+        return _pool
+
+
+def queue_derivatives(product_id, source):
+    """Build derivatives for one uploaded image in the background"""
+    future = _get_pool().submit(render_derivatives, source)
+    future.add_done_callback(partial(_finished, product_id))
+    return future
+
+
+def _finished(product_id, future):
+    # Record from a short-lived thread with its own connection; the callback
+    # itself may run on the pool's management thread or the caller's
+    threading.Thread(target=_record_one, args=(product_id, future), daemon=True).start()
+
+
+def _record_one(product_id, future):
+    try:
+        record_derivatives({product_id: future.result()})
+    except Exception:
+        logger.exception('Failed to build image derivatives for product %s', product_id)
+    finally:
+        connection.close()
+
+
+def build_all(images, workers=WORKERS):
+    """
+    Render derivatives for {product id: image name} in parallel; yields
+    (product id, derivatives or the exception raised) as workers finish
+    """
+    with make_pool(workers) as pool:
+        futures = {pool.submit(render_derivatives, source): pk for pk, source in images.items()}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as exc:
+                yield futures[future], exc
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from meals import benchmarks
+
+BENCHMARKS = {
+    'packages': benchmarks.package_benchmark,
+    'queries': benchmarks.query_benchmark,
+    'render': benchmarks.render_benchmark,
+}
+
+
+class Command(BaseCommand):
+    help = 'Run a performance benchmark and print its numbers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Timed runs per measurement; the median is reported (default 20)')
+
+    def handle(self, *args, **options):
+        rows = BENCHMARKS[options['benchmark']](repeat=options['repeat'])
+        width = max(len(label) for label, _, _ in rows)
+        for label, value, unit in rows:
+            number = f'{value:.2f}' if isinstance(value, float) else str(value)
+            self.stdout.write(f'{label:<{width}}  {number:>10} {unit}'.rstrip())
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from meals.images import WORKERS, build_all, record_derivatives
+from meals.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Build resized JPEG/WebP copies of product images that are missing them, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=WORKERS,
+                            help=f'Worker processes (default {WORKERS})')
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild copies that are already up to date')
+
+    def handle(self, *args, **options):
+        images = {
+            pk: image
+            for pk, image, derived in Product.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('pk', 'image', 'image_derivatives')
+            if options['force'] or (derived or {}).get('source') != image
+        }
+        if not images:
+            self.stdout.write(self.style.SUCCESS('All product images are up to date'))
+            return
+
+        results, failed = {}, 0
+        for pk, result in build_all(images, workers=options['workers']):
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(f'Product {pk} ({images[pk]}): {result}')
+            else:
+                results[pk] = result
+        updated = record_derivatives(results)
+
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {updated} product images'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} images could not be read'))
@@ -0,0 +1,70 @@
+import json
+import shutil
+import subprocess
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+
+from meals.meal_calculator import (
+    ACTIVITY_MULTIPLIERS, LIFE_STAGE_MULTIPLIERS, SUPPLY_HORIZONS, calculate_supply, calculator_constants,
+)
+
+# Reads {"constants", "cases"} on stdin, prints one supply per case
+NODE_SCRIPT = """
+const calculator = require(process.argv[1]);
+let input = '';
+process.stdin.on('data', chunk => input += chunk);
+process.stdin.on('end', () => {
+    const {constants, cases} = JSON.parse(input);
+    const calc = calculator.create(constants);
+    process.stdout.write(JSON.stringify(cases.map(args => calc.calculateSupply(...args))));
+});
+"""
+
+
+class Command(BaseCommand):
+    help = 'Check static/js/meal_calculator.js against meal_calculator.py over the full weight range (needs node)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-weight', type=float, default=300,
+                            help='Heaviest weight checked, in lbs (default 300)')
+        parser.add_argument('--step', type=float, default=0.1,
+                            help='Weight step in lbs (default 0.1)')
+
+    def handle(self, *args, **options):
+        node = shutil.which('node')
+        if node is None:
+            raise CommandError('node is not installed')
+        script = finders.find('js/meal_calculator.js')
+
+        steps = int(round(options['max_weight'] / options['step']))
+        weights = [round(i * options['step'], 4) for i in range(1, steps + 1)]
+        # Whole pounds as ints too: that's what the views and PetProfile pass
+        weights += list(range(1, int(options['max_weight']) + 1))
+        cases = [
+            (weight, activity, stage, days)
+            for weight in weights
+            for activity in (*ACTIVITY_MULTIPLIERS, 'unknown')
+            for stage in (*LIFE_STAGE_MULTIPLIERS, 'unknown')
+            for days in SUPPLY_HORIZONS
+        ]
+
+        result = subprocess.run(
+            [node, '-e', NODE_SCRIPT, script],
+            input=json.dumps({'constants': calculator_constants(), 'cases': cases}),
+            capture_output=True, text=True, check=False,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+
+        mismatches = 0
+        for case, js in zip(cases, json.loads(result.stdout)):
+            python = calculate_supply(*case)
+            if js != python:
+                mismatches += 1
+                if mismatches <= 10:
+                    self.stderr.write(f'{case}: python {python} != js {js}')
+
+        if mismatches:
+            raise CommandError(f'{mismatches} of {len(cases)} cases differ')
+        self.stdout.write(self.style.SUCCESS(f'meal_calculator.js matches meal_calculator.py on {len(cases)} cases'))
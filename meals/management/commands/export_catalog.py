@@ -0,0 +1,45 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from meals import catalog_io
+
+
+class Command(BaseCommand):
+    help = 'Stream-export products or meals to CSV/JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=['products', 'meals'])
+        parser.add_argument('path', help="Output file, or '-' for stdout")
+        parser.add_argument('--format', choices=catalog_io.FORMATS,
+                            help='Output format (default: from the file extension, else csv)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database at a time (default 2000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            fmt = catalog_io.detect_format(path, options['format'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options['model'] == 'products':
+            columns, rows = catalog_io.PRODUCT_COLUMNS, catalog_io.product_rows(options['chunk_size'])
+        else:
+            columns, rows = catalog_io.MEAL_COLUMNS, catalog_io.meal_rows(options['chunk_size'])
+
+        started = time.perf_counter()
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            count = catalog_io.write_rows(stream, fmt, columns, rows)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        elapsed = time.perf_counter() - started
+
+        if stream is not sys.stdout:
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported {count} {options['model']} in {elapsed:.2f}s "
+                f"({count / elapsed if elapsed else 0:,.0f} rows/s)"
+            ))
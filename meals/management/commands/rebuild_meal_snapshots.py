@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from meals.cache import bump_catalog_version
+from meals.models import Meal
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized product price/package/density columns on every Meal'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Meals updated per UPDATE statement (default 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = list(Meal.objects.order_by('pk').values_list('pk', flat=True))
+        updated = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            with transaction.atomic():
+                updated += Meal.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).refresh_product_snapshot()
+        transaction.on_commit(bump_catalog_version)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt product snapshot for {updated} meals'))
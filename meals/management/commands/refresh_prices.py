@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from meals import catalog_io
+
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = 'Apply a sku,price feed, writing only the prices that changed and recording their history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Price feed file or http(s) URL, or '-' for stdin")
+        parser.add_argument('--format', choices=catalog_io.FORMATS,
+                            help='Feed format (default: from the file extension, else csv)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows diffed per query and written per transaction (default 5000)')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        try:
+            fmt = catalog_io.detect_format(source.split('?', 1)[0], options['format'])
+            stream = catalog_io.open_feed(source)
+        except (ValueError, OSError) as e:
+            raise CommandError(e)
+
+        try:
+            stats = catalog_io.import_prices(catalog_io.read_rows(stream, fmt), batch_size=options['batch_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for line_number, error in stats.errors[:MAX_ERRORS_SHOWN]:
+            self.stderr.write(f'  line {line_number}: {error}')
+        if len(stats.errors) > MAX_ERRORS_SHOWN:
+            self.stderr.write(f'  ... and {len(stats.errors) - MAX_ERRORS_SHOWN} more')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed prices: {stats.rows} rows read, {stats.updated} changed, "
+            f"{stats.unchanged} unchanged, {len(stats.errors)} skipped "
+            f"in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s)"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from meals.models import SavedMeal
+
+
+class Command(BaseCommand):
+    help = "Recompute every saved meal's stored portions from its pet (run after changing meal_calculator)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Saved meals read and written per batch (default 1000)')
+
+    def handle(self, *args, **options):
+        updated = SavedMeal.objects.sync_portions(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated portions on {updated} saved meals'))
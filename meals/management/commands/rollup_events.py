@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from meals.rollups import fold_all
+
+
+class Command(BaseCommand):
+    help = 'Fold new click and recommendation events into the hourly/daily rollup tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50000,
+                            help='Events folded per transaction (default 50000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        folded = fold_all(batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {name}' for name, count in folded.items())
+        self.stdout.write(self.style.SUCCESS(f'Folded {summary} in {elapsed:.2f}s'))
@@ -1,6 +1,13 @@
 """
 Meal calculation engine based on your formulas
 """
+import hashlib
+import json
+import threading
+from bisect import bisect_left
+from decimal import Decimal
+from functools import lru_cache
+from math import gcd
 
 # Activity level multipliers
 ACTIVITY_MULTIPLIERS = {
@@ -26,6 +33,23 @@ CALORIE_CHART = {
     100: (1750, 2000),
 }
 
+# Past the chart: extra (min, max) calories per full step of weight over 100 lbs
+OVER_CHART_STEP_LBS = 10
+OVER_CHART_EXTRA_CALORIES = (40, 50)
+
+# Life stage adjustment (seniors typically need slightly less)
+LIFE_STAGE_MULTIPLIERS = {
+    'puppy': 1.10,
+    'adult': 1.0,
+    'senior': 0.90,
+}
+
+# Heaviest weight (lbs) in each Meal size category; heavier dogs are 'large'
+SIZE_CATEGORY_LIMITS = (
+    (25, 'small'),
+    (60, 'medium'),
+)
+
 # Ratio constants (from your formulas)
 WET_FOOD_RATIO = 0.25  # 25% of calories from wet food
 DRY_FOOD_RATIO = 0.75  # 75% of calories from dry food
@@ -36,33 +60,54 @@ WET_FOOD_CAL_PER_OZ = 25
 DRY_FOOD_CAL_PER_OZ = 95
 TREAT_CAL_PER_OZ = 87.5  # ~1400 cal per 16oz
 
+OZ_PER_CUP = 4
+OZ_PER_LB = 16
+
+# Heaviest weight (lbs) the finder, detail pages and API accept
+MAX_WEIGHT_LBS = 300
+
+# Sorted chart brackets for bisect lookups, and their (min, max) calories
+CHART_WEIGHTS = tuple(sorted(CALORIE_CHART))
+CHART_MIN = tuple(CALORIE_CHART[weight][0] for weight in CHART_WEIGHTS)
+CHART_MAX = tuple(CALORIE_CHART[weight][1] for weight in CHART_WEIGHTS)
+
+# Portion results are memoized per (weight, activity level, life stage).
+# Weights are whole pounds, so 5-300 lbs x 3 x 3 fits comfortably.
+PORTION_CACHE_SIZE = 4096
+
+# Shopping horizons a plan can cover, in days
+SUPPLY_HORIZONS = (14, 30, 45, 90)
+DEFAULT_SUPPLY_DAYS = 45
+
+# Package optimizer: sizes are compared in hundredths of a pound and prices
+# in cents, so the tables are exact integer arithmetic.
+PACKAGE_SCALE = 100
+# One table per distinct set of package options (roughly one per product)
+PACKAGE_TABLE_CACHE_SIZE = 2048
+# Largest table (in units) a lookup may grow; 200 lbs even when the sizes
+# only share a gcd of 0.01 lb, more than a 300 lb dog eats in 90 days.
+# Larger amounts are topped up greedily (see PackageTable.cover).
+MAX_PACKAGE_UNITS = 20000
+
+# Meal product slot -> supply amount (lbs) it has to cover
+SUPPLY_SLOTS = {'dry_food': 'dry_food_lbs', 'wet_food': 'wet_food_lbs', 'treats': 'treat_lbs'}
+
+
+def get_size_category(weight):
+    """
+    Map a dog's weight to the Meal size category it shops from
+    """
+    for limit, category in SIZE_CATEGORY_LIMITS:
+        if weight <= limit:
+            return category
+    return 'large'
+
 
 def get_daily_calories(weight, activity_level='moderate'):
     """
     Calculate daily calorie needs based on weight and activity level
     """
-    # Find closest weight in chart
-    if weight <= 5:
-        base_calories = CALORIE_CHART[5]
-    elif weight >= 100:
-        # For dogs over 100 lbs, add 40-50 calories per 10 lbs
-        extra_weight = weight - 100
-        extra_tens = extra_weight // 10
-        base_min, base_max = CALORIE_CHART[100]
-        base_calories = (base_min + (extra_tens * 40), base_max + (extra_tens * 50))
-    else:
-        # Find nearest weight bracket
-        weights = sorted(CALORIE_CHART.keys())
-        for i, w in enumerate(weights):
-            if weight <= w:
-                base_calories = CALORIE_CHART[w]
-                break
-    
-    # Calculate average and apply activity multiplier
-    avg_calories = (base_calories[0] + base_calories[1]) / 2
-    multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, 1.0)
-    
-    return int(avg_calories * multiplier)
+    return daily_calories_batch((weight,), (activity_level,))[0]
 
 
 def calculate_portions(weight, activity_level='moderate', life_stage='adult'):
@@ -70,91 +115,258 @@ def calculate_portions(weight, activity_level='moderate', life_stage='adult'):
     Calculate daily portions of wet food, dry food, and treats
     Returns dict with portions in ounces
     """
-    daily_calories = get_daily_calories(weight, activity_level)
-    
+    return dict(_portions(weight, activity_level, life_stage))
+
+
+@lru_cache(maxsize=PORTION_CACHE_SIZE)
+def _portions(weight, activity_level, life_stage):
+    columns = portions_batch((weight,), (activity_level,), (life_stage,))
+    return {field: column[0] for field, column in columns.items()}
+
+
+def calculate_supply(weight, activity_level='moderate', life_stage='adult', days=DEFAULT_SUPPLY_DAYS):
+    """
+    Calculate product quantities needed for a supply of the given number of days
+    """
+    supply = _supply(weight, activity_level, life_stage, days)
+    return dict(supply, daily_portions=dict(supply['daily_portions']))
+
+
+def calculate_45_day_supply(weight, activity_level='moderate', life_stage='adult'):
+    """
+    Calculate product quantities needed for a 45-day supply
+    """
+    return calculate_supply(weight, activity_level, life_stage, 45)
+
+
+@lru_cache(maxsize=PORTION_CACHE_SIZE)
+def _supply(weight, activity_level, life_stage, days):
+    # Every horizon scales the same memoized daily portions
+    daily = _portions(weight, activity_level, life_stage)
+    columns = supply_batch({field: (daily[field],) for field in PORTION_FIELDS}, (days,))
+    return {'days': days, 'daily_portions': daily, **{field: column[0] for field, column in columns.items()}}
+
+
+def calculator_constants():
+    """
+    Every constant the portion and supply formulas use, as plain JSON data
+    for static/js/meal_calculator.js, which mirrors the formulas above
+    """
+    return {
+        'calorie_chart': [[weight, low, high] for weight, (low, high) in sorted(CALORIE_CHART.items())],
+        'over_chart_step_lbs': OVER_CHART_STEP_LBS,
+        'over_chart_extra_calories': list(OVER_CHART_EXTRA_CALORIES),
+        'activity_multipliers': ACTIVITY_MULTIPLIERS,
+        'life_stage_multipliers': LIFE_STAGE_MULTIPLIERS,
+        'size_category_limits': [list(limit) for limit in SIZE_CATEGORY_LIMITS],
+        'ratios': {'wet': WET_FOOD_RATIO, 'dry': DRY_FOOD_RATIO, 'treat': TREAT_RATIO},
+        'cal_per_oz': {'wet': WET_FOOD_CAL_PER_OZ, 'dry': DRY_FOOD_CAL_PER_OZ, 'treat': TREAT_CAL_PER_OZ},
+        'oz_per_cup': OZ_PER_CUP,
+        'oz_per_lb': OZ_PER_LB,
+        'supply_horizons': list(SUPPLY_HORIZONS),
+        'default_supply_days': DEFAULT_SUPPLY_DAYS,
+    }
+
+
+# Content hash of the constants: versions the cacheable constants URL
+CALCULATOR_VERSION = hashlib.sha256(
+    json.dumps(calculator_constants(), sort_keys=True).encode()
+).hexdigest()[:12]
+
+
+PORTION_FIELDS = ('daily_calories', 'wet_food_oz', 'dry_food_oz', 'dry_food_cups', 'treat_oz', 'treat_calories')
+SUPPLY_FIELDS = ('wet_food_lbs', 'wet_food_oz', 'dry_food_lbs', 'treat_lbs')
+
+def daily_calories_batch(weights, activity_levels):
+    """
+    Daily calories for parallel sequences of weights and activity levels
+    Each weight uses the nearest chart bracket at or above it (the first
+    bracket below the chart); past the chart, OVER_CHART_EXTRA_CALORIES are
+    added per full OVER_CHART_STEP_LBS over the last bracket.
+    """
+    last = len(CHART_WEIGHTS) - 1
+    brackets = [min(bisect_left(CHART_WEIGHTS, weight), last) for weight in weights]
+    steps = [max(weight - CHART_WEIGHTS[last], 0) // OVER_CHART_STEP_LBS for weight in weights]
+    extra_min, extra_max = OVER_CHART_EXTRA_CALORIES
+    averages = [
+        (CHART_MIN[bracket] + step * extra_min + CHART_MAX[bracket] + step * extra_max) / 2
+        for bracket, step in zip(brackets, steps)
+    ]
+    multipliers = [ACTIVITY_MULTIPLIERS.get(level, 1.0) for level in activity_levels]
+    return [int(average * multiplier) for average, multiplier in zip(averages, multipliers)]
+
+
+def portions_batch(weights, activity_levels, life_stages):
+    """
+    Daily portions as columns: {field: [...]} for each of PORTION_FIELDS
+    """
+    calories = daily_calories_batch(weights, activity_levels)
     # Adjust for life stage (seniors typically need slightly less)
-    if life_stage == 'senior':
-        daily_calories = int(daily_calories * 0.90)
-    elif life_stage == 'puppy':
-        daily_calories = int(daily_calories * 1.10)
-    
-    # Calculate calories from each component
-    wet_calories = daily_calories * WET_FOOD_RATIO
-    dry_calories = daily_calories * DRY_FOOD_RATIO
-    treat_calories = daily_calories * TREAT_RATIO
-    
-    # Convert to ounces
-    wet_oz = wet_calories / WET_FOOD_CAL_PER_OZ
-    dry_oz = dry_calories / DRY_FOOD_CAL_PER_OZ
-    treat_oz = treat_calories / TREAT_CAL_PER_OZ
-    
-    # Also convert dry food to cups (4 oz = 1 cup)
-    dry_cups = dry_oz / 4
-    
+    multipliers = [LIFE_STAGE_MULTIPLIERS.get(stage, 1.0) for stage in life_stages]
+    calories = [int(daily * multiplier) for daily, multiplier in zip(calories, multipliers)]
+
+    # Convert calories from each component to ounces
+    wet_oz = [daily * WET_FOOD_RATIO / WET_FOOD_CAL_PER_OZ for daily in calories]
+    dry_oz = [daily * DRY_FOOD_RATIO / DRY_FOOD_CAL_PER_OZ for daily in calories]
+    treat_calories = [daily * TREAT_RATIO for daily in calories]
+
     return {
-        'daily_calories': daily_calories,
-        'wet_food_oz': round(wet_oz, 1),
-        'dry_food_oz': round(dry_oz, 1),
-        'dry_food_cups': round(dry_cups, 2),
-        'treat_oz': round(treat_oz, 1),
-        'treat_calories': int(treat_calories),
+        'daily_calories': calories,
+        'wet_food_oz': [round(oz, 1) for oz in wet_oz],
+        'dry_food_oz': [round(oz, 1) for oz in dry_oz],
+        'dry_food_cups': [round(oz / OZ_PER_CUP, 2) for oz in dry_oz],
+        'treat_oz': [round(cal / TREAT_CAL_PER_OZ, 1) for cal in treat_calories],
+        'treat_calories': [int(cal) for cal in treat_calories],
     }
 
 
-def calculate_45_day_supply(weight, activity_level='moderate', life_stage='adult'):
+def supply_batch(portions, days):
     """
-    Calculate product quantities needed for a 45-day supply
+    Supply columns ({field: [...]} for each of SUPPLY_FIELDS) from
+    portions_batch() columns and a parallel sequence of horizons in days
     """
-    daily = calculate_portions(weight, activity_level, life_stage)
-    
-    # 45-day totals
-    wet_total_oz = daily['wet_food_oz'] * 45
-    dry_total_oz = daily['dry_food_oz'] * 45
-    treat_total_oz = daily['treat_oz'] * 45
-    
-    # Convert to pounds
-    wet_lbs = wet_total_oz / 16
-    dry_lbs = dry_total_oz / 16
-    treat_lbs = treat_total_oz / 16
-    
+    wet_total_oz = [oz * day for oz, day in zip(portions['wet_food_oz'], days)]
+    dry_total_oz = [oz * day for oz, day in zip(portions['dry_food_oz'], days)]
+    treat_total_oz = [oz * day for oz, day in zip(portions['treat_oz'], days)]
     return {
-        'daily_portions': daily,
-        'wet_food_lbs': round(wet_lbs, 1),
-        'wet_food_oz': round(wet_total_oz, 1),
-        'dry_food_lbs': round(dry_lbs, 1),
-        'treat_lbs': round(treat_lbs, 1),
+        'wet_food_lbs': [round(oz / OZ_PER_LB, 1) for oz in wet_total_oz],
+        'wet_food_oz': [round(oz, 1) for oz in wet_total_oz],
+        'dry_food_lbs': [round(oz / OZ_PER_LB, 1) for oz in dry_total_oz],
+        'treat_lbs': [round(oz / OZ_PER_LB, 1) for oz in treat_total_oz],
     }
 
 
-def recommend_package_sizes(portions_45_day, meal):
+def calculate_portions_batch(weights, activity_levels, life_stages, days=DEFAULT_SUPPLY_DAYS):
     """
-    Recommend specific package quantities based on meal products
-    Returns shopping list
+    Calculate daily portions and a days-long supply for many pets at once
+    Takes parallel sequences (e.g. from PetProfile values_list) and returns
+    columns in input order: {'portions': {field: [...]}, 'supply': {field: [...]}}
+    days is one horizon for everyone or a parallel sequence (e.g. each pet's
+    supply_days). The scalar functions above are single-row calls of the
+    same column operations, so their results are identical.
     """
-    # Get product package sizes
-    dry_pkg_size = float(meal.dry_food.package_size)
-    wet_pkg_size = float(meal.wet_food.package_size)
-    treat_pkg_size = float(meal.treats.package_size)
-    
-    # Calculate packages needed
-    dry_bags = int(portions_45_day['dry_food_lbs'] / dry_pkg_size) + 1
-    wet_packages = int(portions_45_day['wet_food_lbs'] / wet_pkg_size) + 1
-    treat_bags = int(portions_45_day['treat_lbs'] / treat_pkg_size) + 1
-    
+    weights = list(weights)
+    activity_levels = list(activity_levels)
+    life_stages = list(life_stages)
+    days = [days] * len(weights) if isinstance(days, int) else list(days)
+    if not len(weights) == len(activity_levels) == len(life_stages) == len(days):
+        raise ValueError('weights, activity_levels, life_stages and days must be the same length')
+
+    portions = portions_batch(weights, activity_levels, life_stages)
     return {
-        'dry_food': {
-            'product': meal.dry_food,
-            'quantity': dry_bags,
-            'total_lbs': dry_bags * dry_pkg_size,
-        },
-        'wet_food': {
-            'product': meal.wet_food,
-            'quantity': wet_packages,
-            'total_lbs': wet_packages * wet_pkg_size,
-        },
-        'treats': {
-            'product': meal.treats,
-            'quantity': treat_bags,
-            'total_lbs': treat_bags * treat_pkg_size,
-        },
-    }
\ No newline at end of file
+        'portions': portions,
+        'supply': supply_batch(portions, days),
+    }
+
+
+class PackageTable:
+    """
+    Cheapest way to cover an amount with one product's package options
+    (an unbounded covering knapsack). cost[n] is the cheapest price, in
+    cents, for at least n units, where a unit is the gcd of the package
+    sizes. The table only grows as larger amounts are asked for, and is
+    shared through package_table(), so after the first lookup for a product
+    each plan is a list index plus a walk over the chosen packages. The
+    table never grows past MAX_PACKAGE_UNITS.
+    """
+
+    def __init__(self, options):
+        sizes = [round(float(size) * PACKAGE_SCALE) for size, _ in options]
+        if not any(size > 0 for size in sizes):
+            raise ValueError('At least one package size must be positive')
+        self.unit = gcd(*(size for size in sizes if size > 0))
+        self.options = [
+            (index, size // self.unit, round(float(price) * 100))
+            for index, ((_, price), size) in enumerate(zip(options, sizes))
+            if size > 0
+        ]
+        self.sizes = {index: size for index, size, _ in self.options}
+        # Lowest price per unit (largest on ties): what very large amounts
+        # are mostly made of
+        self.bulk = min(self.options, key=lambda option: (option[2] / option[1], -option[1]))
+        self.count = len(options)
+        self.cost = [0]
+        self.choice = [None]
+        self._lock = threading.Lock()
+
+    def _grow(self, units):
+        with self._lock:
+            cost, choice = self.cost, self.choice
+            for amount in range(len(cost), units + 1):
+                best = best_index = None
+                for index, size, cents in self.options:
+                    total = cents + cost[amount - size] if amount > size else cents
+                    if best is None or total < best:
+                        best, best_index = total, index
+                cost.append(best)
+                choice.append(best_index)
+
+    def cover(self, lbs):
+        """
+        (total cents, package counts per option) for at least lbs
+        Past MAX_PACKAGE_UNITS, whole bulk packages cover the excess and the
+        table plans the rest, so the result is exact up to that point and
+        close to it beyond.
+        """
+        units = -(-round(lbs * PACKAGE_SCALE) // self.unit)
+        counts = [0] * self.count
+        extra = 0
+        if units > MAX_PACKAGE_UNITS:
+            index, size, cents = self.bulk
+            bulk = -(-(units - MAX_PACKAGE_UNITS) // size)
+            counts[index] = bulk
+            units -= bulk * size
+            extra = bulk * cents
+        if units >= len(self.cost):
+            self._grow(units)
+
+        remaining = units
+        while remaining > 0:
+            index = self.choice[remaining]
+            counts[index] += 1
+            remaining -= self.sizes[index]
+        return self.cost[max(units, 0)] + extra, tuple(counts)
+
+
+@lru_cache(maxsize=PACKAGE_TABLE_CACHE_SIZE)
+def package_table(options):
+    return PackageTable(options)
+
+
+def cheapest_packages(lbs, options):
+    """
+    Cheapest combination of packages covering lbs
+    options is a sequence of (package_size, price) pairs, e.g. a product's
+    own package followed by its variants. Returns (total_price, counts) with
+    counts[i] packages of options[i].
+    """
+    cents, counts = package_table(tuple(options)).cover(lbs)
+    return Decimal(cents).scaleb(-2), counts
+
+
+def recommend_package_sizes(supply, meal, variants=None):
+    """
+    Recommend specific package quantities covering a supply from
+    calculate_supply, based on meal products
+    variants maps product id -> extra (package_size, price) options
+    (see meals.plans.package_variants)
+    Returns shopping list
+    """
+    variants = variants or {}
+    shopping_list = {}
+    for slot, supply_key in SUPPLY_SLOTS.items():
+        product = getattr(meal, slot)
+        options = ((product.package_size, product.price),) + tuple(variants.get(product.pk, ()))
+        cost, counts = cheapest_packages(supply[supply_key], options)
+        packages = [
+            {'package_size': size, 'price': price, 'quantity': count}
+            for (size, price), count in zip(options, counts) if count
+        ]
+        shopping_list[slot] = {
+            'product': product,
+            'quantity': sum(counts),
+            'total_lbs': sum(float(p['package_size']) * p['quantity'] for p in packages),
+            'packages': packages,
+            'cost': cost,
+        }
+    return shopping_list
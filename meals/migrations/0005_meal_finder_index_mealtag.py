@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:01
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_meal_tags(apps, schema_editor):
+    Meal = apps.get_model('meals', 'Meal')
+    MealTag = apps.get_model('meals', 'MealTag')
+    tags = []
+    for meal_id, preference_tags in Meal.objects.values_list('id', 'preference_tags'):
+        value = (preference_tags or '').lower().replace('-', '_')
+        for tag in {t for t in re.split(r'[\s,;/|]+', value) if t}:
+            tags.append(MealTag(meal_id=meal_id, tag=tag))
+    MealTag.objects.bulk_create(tags, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0004_meal_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MealTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.CharField(max_length=50)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='meal',
+            index=models.Index(fields=['size_category', 'life_stage', 'is_active'], name='meal_finder_idx'),
+        ),
+        migrations.AddField(
+            model_name='mealtag',
+            name='meal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='meals.meal'),
+        ),
+        migrations.AddConstraint(
+            model_name='mealtag',
+            constraint=models.UniqueConstraint(fields=('tag', 'meal'), name='unique_meal_tag'),
+        ),
+        migrations.RunPython(populate_meal_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:03
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_product_snapshot(apps, schema_editor):
+    Meal = apps.get_model('meals', 'Meal')
+    Product = apps.get_model('meals', 'Product')
+    updates = {}
+    for fk, prefix in (('dry_food', 'dry'), ('wet_food', 'wet'), ('treats', 'treat')):
+        product = Product.objects.filter(pk=OuterRef(fk)).order_by()
+        for field in ('price', 'package_size', 'calories_per_oz'):
+            updates[f'{prefix}_{field}'] = Subquery(product.values(field)[:1])
+    Meal.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0005_meal_finder_index_mealtag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meal',
+            name='dry_calories_per_oz',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='dry_package_size',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='dry_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='treat_calories_per_oz',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='treat_package_size',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='treat_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='wet_calories_per_oz',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=5),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='wet_package_size',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=6),
+        ),
+        migrations.AddField(
+            model_name='meal',
+            name='wet_price',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.RunPython(fill_product_snapshot, migrations.RunPython.noop),
+    ]
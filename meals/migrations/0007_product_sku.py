@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0006_meal_product_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, help_text='Retailer SKU, used to match rows on catalog import', max_length=64, null=True, unique=True),
+        ),
+    ]
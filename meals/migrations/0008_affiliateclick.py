@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0007_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AffiliateClick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size_category', models.CharField(blank=True, choices=[('small', 'Small (5-25 lbs)'), ('medium', 'Medium (30-60 lbs)'), ('large', 'Large (70-100+ lbs)')], max_length=10)),
+                ('referrer', models.CharField(blank=True, max_length=500)),
+                ('clicked_at', models.DateTimeField(db_index=True)),
+                ('meal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clicks', to='meals.meal')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clicks', to='meals.product')),
+            ],
+            options={
+                'ordering': ['-clicked_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0008_affiliateclick'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecommendationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=5)),
+                ('period_start', models.DateTimeField()),
+                ('brand', models.CharField(max_length=100)),
+                ('size_category', models.CharField(choices=[('small', 'Small (5-25 lbs)'), ('medium', 'Medium (30-60 lbs)'), ('large', 'Large (70-100+ lbs)')], max_length=10)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_rollups', to='meals.meal')),
+            ],
+            options={
+                'ordering': ['-period_start', 'brand'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RecommendationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size_category', models.CharField(choices=[('small', 'Small (5-25 lbs)'), ('medium', 'Medium (30-60 lbs)'), ('large', 'Large (70-100+ lbs)')], max_length=10)),
+                ('life_stage', models.CharField(choices=[('puppy', 'Puppy (4-12 months)'), ('adult', 'Adult (1-8 years)'), ('senior', 'Senior (8+ years)')], max_length=10)),
+                ('position', models.PositiveSmallIntegerField()),
+                ('shown_at', models.DateTimeField(db_index=True)),
+                ('meal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_events', to='meals.meal')),
+            ],
+            options={
+                'ordering': ['-shown_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=5)),
+                ('period_start', models.DateTimeField()),
+                ('brand', models.CharField(max_length=100)),
+                ('size_category', models.CharField(blank=True, choices=[('small', 'Small (5-25 lbs)'), ('medium', 'Medium (30-60 lbs)'), ('large', 'Large (70-100+ lbs)')], max_length=10)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='click_rollups', to='meals.product')),
+            ],
+            options={
+                'ordering': ['-period_start', 'brand'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recommendationrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'period_start', 'meal', 'size_category'), name='unique_recommendation_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='clickrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'period_start', 'product', 'size_category'), name='unique_click_rollup'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def seed_price_history(apps, schema_editor):
+    # Start each product's history at its current price
+    Product = apps.get_model('meals', 'Product')
+    ProductPrice = apps.get_model('meals', 'ProductPrice')
+    ProductPrice.objects.bulk_create(
+        ProductPrice(product_id=pk, price=price, recorded_at=updated_at)
+        for pk, price, updated_at in Product.objects.values_list('pk', 'price', 'updated_at').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0009_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='meals.product')),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+                'indexes': [models.Index(fields=['product', 'recorded_at'], name='product_price_history_idx')],
+            },
+        ),
+        migrations.RunPython(seed_price_history, migrations.RunPython.noop),
+    ]
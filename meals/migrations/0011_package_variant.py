@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0010_product_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('package_size', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('is_active', models.BooleanField(default=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='package_variants', to='meals.product')),
+            ],
+            options={
+                'ordering': ['product', 'package_size'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='packagevariant',
+            constraint=models.CheckConstraint(check=models.Q(('package_size__gt', 0)), name='package_variant_size_positive'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0011_package_variant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='petprofile',
+            name='supply_days',
+            field=models.PositiveSmallIntegerField(choices=[(14, '14 days'), (30, '30 days'), (45, '45 days'), (90, '90 days')], default=45, help_text='How many days each shopping trip should cover'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def backfill_skus(apps, schema_editor):
+    # Catalog feeds match products on sku; give older products a generated one
+    # (same format as meals.models.generated_sku)
+    Product = apps.get_model('meals', 'Product')
+    taken = set(Product.objects.exclude(sku=None).exclude(sku='').values_list('sku', flat=True))
+    missing = Product.objects.filter(sku=None) | Product.objects.filter(sku='')
+    for pk in missing.values_list('pk', flat=True).iterator():
+        sku = f'PFH-{pk}'
+        if sku not in taken:
+            Product.objects.filter(pk=pk).update(sku=sku)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meals', '0013_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,25 @@
-from django.db import models
+import re
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import models, transaction
+from django.db.models import Exists, F, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Round
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .meal_calculator import (
+    DEFAULT_SUPPLY_DAYS, PACKAGE_SCALE, SUPPLY_HORIZONS, SUPPLY_SLOTS, calculate_portions,
+    calculate_portions_batch,
+)
+
+
+def generated_sku(pk):
+    """SKU given to products added without a retailer one, so catalog exports can be re-imported"""
+    return f'PFH-{pk}'
+
 
 class Product(models.Model):
     """Individual products (dry food, wet food, treats)"""
@@ -21,6 +41,10 @@ class Product(models.Model):
     
     brand = models.CharField(max_length=100)
     name = models.CharField(max_length=200)
+    sku = models.CharField(
+        max_length=64, unique=True, null=True, blank=True,
+        help_text="Retailer SKU, used to match rows on catalog import"
+    )
     product_type = models.CharField(max_length=10, choices=PRODUCT_TYPES)
     
     # Nutritional info
@@ -40,6 +64,9 @@ class Product(models.Model):
     # Metadata
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized JPEG/WebP copies of image, written by meals.images:
+    # {'source': image name, 'jpeg': [[width, name], ...], 'webp': [...]}
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -49,6 +76,176 @@ class Product(models.Model):
     
     def __str__(self):
         return f"{self.brand} - {self.name} ({self.product_type})"
+    
+    def _derivatives(self, fmt):
+        """[(width, url)] of the fmt copies, empty until built for the current image"""
+        derived = self.image_derivatives or {}
+        if not self.image or derived.get('source') != self.image.name:
+            return []
+        return [(width, self.image.storage.url(name)) for width, name in derived.get(fmt, ())]
+
+    @property
+    def webp_srcset(self):
+        return ', '.join(f'{url} {width}w' for width, url in self._derivatives('webp'))
+
+    @property
+    def jpeg_srcset(self):
+        return ', '.join(f'{url} {width}w' for width, url in self._derivatives('jpeg'))
+
+    @property
+    def thumbnail_url(self):
+        """Smallest JPEG copy, falling back to the original upload"""
+        derived = self._derivatives('jpeg')
+        if derived:
+            return derived[0][1]
+        return self.image.url if self.image else ''
+
+    def lowest_price_since(self, since):
+        """Cheapest price in effect at any point from `since` on (e.g. "cheapest this month")"""
+        history = self.price_history.order_by()
+        candidates = [
+            self.price,
+            history.filter(recorded_at__gte=since).aggregate(lowest=Min('price'))['lowest'],
+            # the price already in effect when the window opened
+            history.filter(recorded_at__lt=since).order_by('-recorded_at')
+                   .values_list('price', flat=True).first(),
+        ]
+        return min(price for price in candidates if price is not None)
+
+
+class PackageVariant(models.Model):
+    """
+    Another package size a product is sold in (e.g. a 4 lb bag next to the
+    30 lb one). Shopping lists pick the cheapest mix of the product's own
+    package and its active variants.
+    """
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='package_variants')
+    package_size = models.DecimalField(max_digits=6, decimal_places=2)  # same unit as the product
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+    
+    class Meta:
+        ordering = ['product', 'package_size']
+        constraints = [
+            models.CheckConstraint(check=models.Q(package_size__gt=0), name='package_variant_size_positive'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} {self.package_size} {self.product.package_unit} (${self.price})"
+
+
+class ProductPrice(models.Model):
+    """
+    Product price history; a row is recorded whenever the price changes
+    (admin edits via signals, feeds via meals.catalog_io)
+    """
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='price_history')
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    recorded_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(fields=['product', 'recorded_at'], name='product_price_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product} ${self.price} at {self.recorded_at:%Y-%m-%d %H:%M}"
+
+
+def parse_preference_tags(value):
+    """
+    Split a free-text tag string ("budget, Grain-Free") into normalized tags
+    ({'budget', 'grain_free'}) matching the Product.PREFERENCE_TAGS keys
+    """
+    value = (value or '').lower().replace('-', '_')
+    return {tag for tag in re.split(r'[\s,;/|]+', value) if tag}
+
+
+# Meal product slot -> prefix of its denormalized snapshot columns on Meal
+PRODUCT_SNAPSHOT_SLOTS = {'dry_food': 'dry', 'wet_food': 'wet', 'treats': 'treat'}
+PRODUCT_SNAPSHOT_FIELDS = ('price', 'package_size', 'calories_per_oz')
+
+
+class MealQuerySet(models.QuerySet):
+    """Catalog queries used by the meal finder"""
+
+    def refresh_product_snapshot(self):
+        """
+        Copy current product price, package size and density onto these
+        meals in a single UPDATE. Use after bulk Product changes that skip
+        save() (queryset.update, bulk_update).
+        """
+        updates = {}
+        for fk, prefix in PRODUCT_SNAPSHOT_SLOTS.items():
+            product = Product.objects.filter(pk=OuterRef(fk)).order_by()
+            for field in PRODUCT_SNAPSHOT_FIELDS:
+                updates[f'{prefix}_{field}'] = Subquery(product.values(field)[:1])
+        return self.update(**updates)
+
+    def with_preference(self, preference):
+        """Meals tagged with the given preference (exact tag match)"""
+        queryset = self
+        for tag in parse_preference_tags(preference):
+            queryset = queryset.filter(tags__tag=tag)
+        return queryset
+
+    def candidates(self, size_category, life_stage, preference=''):
+        """
+        Active meals for a dog, unranked (see meals.plans.rank_meals)
+        """
+        return self.filter(
+            size_category=size_category,
+            life_stage=life_stage,
+            is_active=True,
+        ).with_preference(preference)
+
+    def _has_package_variants(self):
+        return reduce(or_, (
+            Exists(PackageVariant.objects.filter(product=OuterRef(fk), is_active=True))
+            for fk in PRODUCT_SNAPSHOT_SLOTS
+        ))
+
+    def with_package_variants(self):
+        """Meals with at least one product sold in an active PackageVariant"""
+        return self.filter(self._has_package_variants())
+
+    def without_package_variants(self):
+        """Meals whose products are each sold in one package only"""
+        return self.exclude(self._has_package_variants())
+
+    def with_supply_cost(self, supply):
+        """
+        Annotate package counts and total_cost for a supply from
+        calculate_supply, so ranking and slicing happen in SQL. Only valid
+        for meals without package variants: each product is bought in its
+        own package, ceil(lbs / package_size) of them, which is what
+        cheapest_packages picks from a single option. Sizes are compared in
+        whole hundredths of a pound like the package tables, so the counts
+        match exactly. Reads the Meal's product snapshot columns, so no
+        joins are needed.
+        """
+        money = models.DecimalField(max_digits=12, decimal_places=2)
+
+        def packages(lbs, prefix):
+            size = Cast(Round(F(f'{prefix}_package_size') * PACKAGE_SCALE), models.IntegerField())
+            amount = Value(round(lbs * PACKAGE_SCALE), output_field=models.IntegerField())
+            return (amount + size - 1) / size
+
+        quantities = {
+            f'{prefix}_quantity': packages(supply[SUPPLY_SLOTS[fk]], prefix)
+            for fk, prefix in PRODUCT_SNAPSHOT_SLOTS.items()
+        }
+        return self.annotate(**quantities).annotate(
+            total_cost=models.ExpressionWrapper(
+                F('dry_quantity') * F('dry_price') +
+                F('wet_quantity') * F('wet_price') +
+                F('treat_quantity') * F('treat_price'),
+                output_field=money,
+            ),
+        )
 
 
 class Meal(models.Model):
@@ -105,17 +302,71 @@ class Meal(models.Model):
     # Preferences
     preference_tags = models.CharField(max_length=100, blank=True)
     
+    # Product snapshot (kept in sync from Product so ranking needs no joins)
+    dry_price = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+    dry_package_size = models.DecimalField(max_digits=6, decimal_places=2, default=0, editable=False)
+    dry_calories_per_oz = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
+    wet_price = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+    wet_package_size = models.DecimalField(max_digits=6, decimal_places=2, default=0, editable=False)
+    wet_calories_per_oz = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
+    treat_price = models.DecimalField(max_digits=8, decimal_places=2, default=0, editable=False)
+    treat_package_size = models.DecimalField(max_digits=6, decimal_places=2, default=0, editable=False)
+    treat_calories_per_oz = models.DecimalField(max_digits=5, decimal_places=2, default=0, editable=False)
+    
     # Metadata
     description = models.TextField(blank=True)
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = MealQuerySet.as_manager()
     
     class Meta:
         ordering = ['-is_featured', 'brand']
+        indexes = [
+            # Meal finder filter: size_category + life_stage + is_active
+            models.Index(fields=['size_category', 'life_stage', 'is_active'], name='meal_finder_idx'),
+        ]
     
     def __str__(self):
         return f"{self.brand} - {self.name}"
+    
+    def save(self, *args, **kwargs):
+        self.copy_product_snapshot()
+        super().save(*args, **kwargs)
+    
+    def copy_product_snapshot(self):
+        """Fill the snapshot columns from the selected products"""
+        for fk, prefix in PRODUCT_SNAPSHOT_SLOTS.items():
+            product = getattr(self, fk)
+            for field in PRODUCT_SNAPSHOT_FIELDS:
+                setattr(self, f'{prefix}_{field}', getattr(product, field))
+    
+    def sync_preference_tags(self):
+        """Bring MealTag rows in line with preference_tags"""
+        tags = parse_preference_tags(self.preference_tags)
+        existing = set(self.tags.values_list('tag', flat=True))
+        if tags == existing:
+            return
+        self.tags.exclude(tag__in=tags).delete()
+        MealTag.objects.bulk_create([MealTag(meal=self, tag=tag) for tag in tags - existing])
+
+
+class MealTag(models.Model):
+    """Normalized, indexed preference tags parsed from Meal.preference_tags"""
+    
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='tags')
+    tag = models.CharField(max_length=50)
+    
+    class Meta:
+        constraints = [
+            # Also serves as the (tag, meal) index for exact tag lookups
+            models.UniqueConstraint(fields=['tag', 'meal'], name='unique_meal_tag'),
+        ]
+    
+    def __str__(self):
+        return self.tag
 
 
 class PetProfile(models.Model):
@@ -139,6 +390,10 @@ class PetProfile(models.Model):
     age_months = models.IntegerField()  # Age in months
     life_stage = models.CharField(max_length=10, choices=LIFE_STAGES)
     activity_level = models.CharField(max_length=10, choices=ACTIVITY_LEVELS, default='moderate')
+    supply_days = models.PositiveSmallIntegerField(
+        choices=[(days, f'{days} days') for days in SUPPLY_HORIZONS], default=DEFAULT_SUPPLY_DAYS,
+        help_text="How many days each shopping trip should cover"
+    )
     
     # Optional details
     breed = models.CharField(max_length=100, blank=True)
@@ -149,11 +404,59 @@ class PetProfile(models.Model):
     
     def __str__(self):
         return f"{self.name} ({self.weight} lbs)"
+    
+    def sync_saved_meals(self):
+        """
+        Recompute this pet's saved meal portions from its current profile
+        Only rows that differ are touched, in a single UPDATE
+        """
+        values = SavedMeal.portion_values(
+            calculate_portions(self.weight, self.activity_level, self.life_stage)
+        )
+        return self.savedmeal_set.exclude(**values).update(**values)
+
+
+class SavedMealQuerySet(models.QuerySet):
+    """Bulk maintenance of stored saved meal portions"""
+
+    def sync_portions(self, batch_size=1000):
+        """
+        Recompute stored portions from each pet's current profile (e.g. after
+        the meal_calculator formulas change), walking the rows in pk order and
+        writing only the changed ones. Rows sharing the same new portions
+        (same weight/activity/life stage) are written with one UPDATE, which
+        is much cheaper than a per-row CASE bulk_update.
+        Returns the number of rows updated.
+        """
+        fields = SavedMeal.PORTION_FIELDS
+        updated = 0
+        last_pk = 0
+        while True:
+            rows = list(self.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', 'pet__weight', 'pet__activity_level', 'pet__life_stage', *fields,
+            )[:batch_size])
+            if not rows:
+                return updated
+            last_pk = rows[-1][0]
+
+            pks, weights, activity_levels, life_stages, *stored = zip(*rows)
+            portions = calculate_portions_batch(weights, activity_levels, life_stages)['portions']
+            changed = defaultdict(list)
+            for i, pk in enumerate(pks):
+                values = tuple(SavedMeal.portion_values({field: portions[field][i] for field in fields}).values())
+                if values != tuple(column[i] for column in stored):
+                    changed[values].append(pk)
+            with transaction.atomic():
+                for values, changed_pks in changed.items():
+                    updated += self.model.objects.filter(pk__in=changed_pks).update(**dict(zip(fields, values)))
 
 
 class SavedMeal(models.Model):
     """User's saved meal plans"""
     
+    # Stored from calculate_portions(), which uses the same keys
+    PORTION_FIELDS = ('daily_calories', 'dry_food_oz', 'wet_food_oz', 'treat_oz')
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_meals')
     pet = models.ForeignKey(PetProfile, on_delete=models.CASCADE)
     meal = models.ForeignKey(Meal, on_delete=models.CASCADE)
@@ -168,8 +471,113 @@ class SavedMeal(models.Model):
     is_current = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = SavedMealQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.user.username} - {self.meal.brand} for {self.pet.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.meal.brand} for {self.pet.name}"
+    
+    @staticmethod
+    def portion_values(portions):
+        """Field values for the stored portions, from calculate_portions() output"""
+        return {
+            field: int(portions[field]) if field == 'daily_calories' else Decimal(str(portions[field]))
+            for field in SavedMeal.PORTION_FIELDS
+        }
+
+
+class AffiliateClick(models.Model):
+    """Outbound affiliate click, written in batches by meals.events"""
+    
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='clicks')
+    meal = models.ForeignKey(Meal, on_delete=models.SET_NULL, null=True, blank=True, related_name='clicks')
+    size_category = models.CharField(max_length=10, choices=Meal.SIZE_CATEGORIES, blank=True)
+    referrer = models.CharField(max_length=500, blank=True)
+    clicked_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-clicked_at']
+    
+    def __str__(self):
+        return f"{self.product} at {self.clicked_at:%Y-%m-%d %H:%M}"
+
+
+class RecommendationEvent(models.Model):
+    """A meal shown on a results page, written in batches by meals.events"""
+    
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='recommendation_events')
+    size_category = models.CharField(max_length=10, choices=Meal.SIZE_CATEGORIES)
+    life_stage = models.CharField(max_length=10, choices=Meal.LIFE_STAGES)
+    position = models.PositiveSmallIntegerField()  # 1 = cheapest
+    shown_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        ordering = ['-shown_at']
+    
+    def __str__(self):
+        return f"{self.meal} #{self.position} at {self.shown_at:%Y-%m-%d %H:%M}"
+
+
+ROLLUP_GRANULARITIES = [
+    ('hour', 'Hourly'),
+    ('day', 'Daily'),
+]
+
+
+class ClickRollup(models.Model):
+    """Affiliate clicks per product and dog size, per hour or day (see meals.rollups)"""
+    
+    granularity = models.CharField(max_length=5, choices=ROLLUP_GRANULARITIES)
+    period_start = models.DateTimeField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='click_rollups')
+    brand = models.CharField(max_length=100)
+    size_category = models.CharField(max_length=10, choices=Meal.SIZE_CATEGORIES, blank=True)
+    clicks = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-period_start', 'brand']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'period_start', 'product', 'size_category'],
+                name='unique_click_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.product} {self.granularity} {self.period_start:%Y-%m-%d %H:%M}: {self.clicks}"
+
+
+class RecommendationRollup(models.Model):
+    """Times each meal was recommended, per dog size, per hour or day (see meals.rollups)"""
+    
+    granularity = models.CharField(max_length=5, choices=ROLLUP_GRANULARITIES)
+    period_start = models.DateTimeField()
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, related_name='recommendation_rollups')
+    brand = models.CharField(max_length=100)
+    size_category = models.CharField(max_length=10, choices=Meal.SIZE_CATEGORIES)
+    impressions = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-period_start', 'brand']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'period_start', 'meal', 'size_category'],
+                name='unique_recommendation_rollup',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.meal} {self.granularity} {self.period_start:%Y-%m-%d %H:%M}: {self.impressions}"
+
+
+class RollupWatermark(models.Model):
+    """Highest event id already folded into a rollup"""
+    
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.last_event_id}"
@@ -0,0 +1,102 @@
+"""
+Meal plan costing with package variants
+
+A product can be bought in its own package or any active PackageVariant,
+so a plan costs the cheapest mix of sizes per product
+(meal_calculator.cheapest_packages). That mix isn't a SQL expression, but
+for meals without variants it is simply ceil(lbs / package_size) packages
+of each product, so rank_meals() ranks and slices those in SQL
+(Meal.objects.with_supply_cost) and only loads and costs meals with variants
+here. Batches that rank many dogs against the same candidates load them
+once as .values() rows and call rank_candidates() directly.
+"""
+from .meal_calculator import SUPPLY_SLOTS, cheapest_packages
+from .models import PRODUCT_SNAPSHOT_SLOTS, Meal, PackageVariant
+
+# Meal product slot -> row key for its package count
+QUANTITY_KEYS = {'dry_food': 'dry_quantity', 'wet_food': 'wet_quantity', 'treats': 'treat_quantity'}
+
+# Columns rank_candidates() needs on each candidate row
+COST_COLUMNS = (
+    *(f'{fk}_id' for fk in PRODUCT_SNAPSHOT_SLOTS),
+    *(f'{prefix}_{field}' for prefix in PRODUCT_SNAPSHOT_SLOTS.values() for field in ('package_size', 'price')),
+    'is_featured', 'brand',
+)
+
+
+def _rank_key(row):
+    # Meal.Meta.ordering breaks ties
+    return row['total_cost'], not row['is_featured'], row['brand']
+
+
+def product_ids(rows):
+    """Ids of every product used by candidate rows"""
+    return {row[f'{fk}_id'] for row in rows for fk in PRODUCT_SNAPSHOT_SLOTS}
+
+
+def package_variants(ids):
+    """{product_id: ((package_size, price), ...)} of active variants"""
+    variants = {}
+    rows = PackageVariant.objects.filter(
+        product_id__in=ids, is_active=True,
+    ).order_by('product_id', 'package_size').values_list('product_id', 'package_size', 'price')
+    for product_id, package_size, price in rows:
+        variants.setdefault(product_id, []).append((package_size, price))
+    return {product_id: tuple(options) for product_id, options in variants.items()}
+
+
+def rank_candidates(candidates, supply, variants, limit=None):
+    """
+    Cost candidate meal rows for one dog's supply (from calculate_supply)
+    and return the cheapest first
+    (ties broken like Meal.Meta.ordering). Each returned row is a copy with
+    total_cost, cost_per_day, the per-slot package counts and a
+    `{slot}_packages` list of (package_size, price, quantity).
+    """
+    ranked = []
+    for row in candidates:
+        costed = dict(row)
+        total = 0
+        for fk, prefix in PRODUCT_SNAPSHOT_SLOTS.items():
+            options = (
+                (row[f'{prefix}_package_size'], row[f'{prefix}_price']),
+            ) + variants.get(row[f'{fk}_id'], ())
+            cost, counts = cheapest_packages(supply[SUPPLY_SLOTS[fk]], options)
+            costed[QUANTITY_KEYS[fk]] = sum(counts)
+            costed[f'{fk}_packages'] = [
+                (size, price, count) for (size, price), count in zip(options, counts) if count
+            ]
+            total += cost
+        costed['total_cost'] = total
+        costed['cost_per_day'] = total / supply['days']
+        ranked.append(costed)
+    ranked.sort(key=_rank_key)
+    return ranked[:limit]
+
+
+def rank_meals(meals, supply, columns=('id',), limit=None):
+    """
+    Rank a Meal queryset (e.g. Meal.objects.candidates(...)) for one dog's
+    supply, cheapest first. Returns (rows, variants): .values() rows with
+    columns plus everything rank_candidates() adds, and the variants of the
+    meals costed here (for recommend_package_sizes).
+    Meals without package variants are ranked and cut to limit in SQL;
+    only meals with variants are loaded and costed in Python.
+    """
+    columns = list(dict.fromkeys([*columns, *COST_COLUMNS]))
+    ordering = ('total_cost', *Meal._meta.ordering)
+    single = meals.without_package_variants().with_supply_cost(supply).order_by(*ordering)
+    single = single.values(*columns, *QUANTITY_KEYS.values(), 'total_cost')[:limit]
+    ranked = []
+    for row in single:
+        for fk, prefix in PRODUCT_SNAPSHOT_SLOTS.items():
+            count = row[QUANTITY_KEYS[fk]]
+            row[f'{fk}_packages'] = [(row[f'{prefix}_package_size'], row[f'{prefix}_price'], count)] if count else []
+        row['cost_per_day'] = row['total_cost'] / supply['days']
+        ranked.append(row)
+
+    mixed = list(meals.with_package_variants().values(*columns))
+    variants = package_variants(product_ids(mixed)) if mixed else {}
+    ranked += rank_candidates(mixed, supply, variants)
+    ranked.sort(key=_rank_key)
+    return ranked[:limit], variants
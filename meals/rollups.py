@@ -0,0 +1,124 @@
+"""
+Incremental analytics rollups
+
+Raw AffiliateClick and RecommendationEvent rows are folded into hourly and
+daily summary tables. Each rollup keeps a watermark (the highest event id
+already counted), so a run only aggregates events added since the last one
+and the admin dashboards never GROUP BY over raw events.
+
+Ids are assigned at insert but every worker process has its own writer
+thread (meals.events), so transactions can commit out of id order: a run
+may see id 11 while id 10 is still uncommitted. The watermark therefore
+stops short of the first event newer than SAFETY_LAG, giving in-flight
+writes time to commit before their id range is passed.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .events import FLUSH_INTERVAL
+from .models import (
+    AffiliateClick, ClickRollup, RecommendationEvent, RecommendationRollup, RollupWatermark,
+)
+
+Rollup = namedtuple('Rollup', 'name event_model rollup_model time_field key brand_path count_field')
+
+ROLLUPS = (
+    Rollup('clicks', AffiliateClick, ClickRollup, 'clicked_at', 'product', 'product__brand', 'clicks'),
+    Rollup('recommendations', RecommendationEvent, RecommendationRollup, 'shown_at', 'meal', 'meal__brand', 'impressions'),
+)
+
+TRUNCATIONS = (
+    ('hour', TruncHour),
+    ('day', TruncDay),
+)
+
+# Events this recent are left for a later run (several buffer flushes)
+SAFETY_LAG = timedelta(seconds=getattr(settings, 'ANALYTICS_ROLLUP_LAG', 6 * FLUSH_INTERVAL))
+
+
+def fold(rollup, batch_size=50000, now=None):
+    """
+    Fold up to batch_size new events into the hourly and daily rollups,
+    stopping before the first event newer than SAFETY_LAG
+    Returns the number of events folded (0 when caught up)
+    """
+    key_id = f'{rollup.key}_id'
+    cutoff = (now or timezone.now()) - SAFETY_LAG
+
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.get_or_create(name=rollup.name)
+        # Lock the watermark so overlapping runs can't count events twice
+        watermark = RollupWatermark.objects.select_for_update().get(pk=watermark.pk)
+
+        pending = rollup.event_model.objects.filter(pk__gt=watermark.last_event_id).order_by('pk')
+        recent = pending.filter(**{f'{rollup.time_field}__gte': cutoff}).values_list('pk', flat=True).first()
+        if recent is not None:
+            pending = pending.filter(pk__lt=recent)
+        ids = list(pending.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        events = rollup.event_model.objects.filter(pk__gt=watermark.last_event_id, pk__lte=ids[-1])
+
+        for granularity, trunc in TRUNCATIONS:
+            groups = events.annotate(
+                period=trunc(rollup.time_field),
+            ).order_by().values(
+                'period', key_id, rollup.brand_path, 'size_category',
+            ).annotate(n=Count('pk'))
+            _merge(rollup, granularity, list(groups))
+
+        watermark.last_event_id = ids[-1]
+        watermark.save()
+        return len(ids)
+
+
+def _merge(rollup, granularity, groups):
+    """Add aggregated counts to existing rollup rows, creating missing ones"""
+    if not groups:
+        return
+    key_id = f'{rollup.key}_id'
+    model = rollup.rollup_model
+
+    existing = {
+        (row.period_start, getattr(row, key_id), row.size_category): row
+        for row in model.objects.filter(
+            granularity=granularity,
+            period_start__in={g['period'] for g in groups},
+            **{f'{key_id}__in': {g[key_id] for g in groups}},
+        )
+    }
+    to_create, to_update = [], []
+    for group in groups:
+        row = existing.get((group['period'], group[key_id], group['size_category']))
+        if row is None:
+            to_create.append(model(**{
+                'granularity': granularity,
+                'period_start': group['period'],
+                key_id: group[key_id],
+                'brand': group[rollup.brand_path],
+                'size_category': group['size_category'],
+                rollup.count_field: group['n'],
+            }))
+        else:
+            setattr(row, rollup.count_field, getattr(row, rollup.count_field) + group['n'])
+            to_update.append(row)
+    model.objects.bulk_create(to_create)
+    model.objects.bulk_update(to_update, [rollup.count_field])
+
+
+def fold_all(batch_size=50000, now=None):
+    """Fold every rollup until caught up; returns {name: events folded}"""
+    now = now or timezone.now()
+    folded = {}
+    for rollup in ROLLUPS:
+        total = 0
+        while count := fold(rollup, batch_size, now):
+            total += count
+        folded[rollup.name] = total
+    return folded
@@ -0,0 +1,80 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version, bump_household_version
+from .images import queue_derivatives
+from .models import Meal, PackageVariant, PetProfile, Product, ProductPrice, SavedMeal, generated_sku
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Meal)
+@receiver(post_delete, sender=Meal)
+@receiver(post_save, sender=PackageVariant)
+@receiver(post_delete, sender=PackageVariant)
+def catalog_changed(sender, **kwargs):
+    """
+    Product/Meal/variant edits (including admin list_editable prices) expire
+    cached pages once they commit, so nothing rendered from the old rows can
+    be cached under the new version
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def assign_sku(sender, instance, **kwargs):
+    """Catalog feeds match products on sku, so every product needs one"""
+    if not instance.sku:
+        instance.sku = generated_sku(instance.pk)
+        Product.objects.filter(pk=instance.pk).update(sku=instance.sku)
+
+
+@receiver(post_save, sender=Meal)
+def sync_meal_tags(sender, instance, **kwargs):
+    """Keep MealTag rows in line with the free-text preference_tags"""
+    instance.sync_preference_tags()
+
+
+@receiver(post_save, sender=Product)
+def refresh_meal_snapshots(sender, instance, **kwargs):
+    """Push price/package/density edits onto every meal using the product"""
+    Meal.objects.filter(
+        Q(dry_food=instance) | Q(wet_food=instance) | Q(treats=instance)
+    ).refresh_product_snapshot()
+
+
+@receiver(post_save, sender=Product)
+def record_price_change(sender, instance, created, **kwargs):
+    """Append to the price history when a save changes the price"""
+    if not created:
+        last = instance.price_history.order_by('-recorded_at').values_list('price', flat=True).first()
+        if last == instance.price:
+            return
+    ProductPrice.objects.create(product=instance, price=instance.price)
+
+
+@receiver(post_save, sender=Product)
+def build_image_derivatives(sender, instance, **kwargs):
+    """Resize a new or replaced image in the background once the save commits"""
+    if instance.image and instance.image_derivatives.get('source') != instance.image.name:
+        transaction.on_commit(partial(queue_derivatives, instance.pk, instance.image.name))
+
+
+@receiver(post_save, sender=PetProfile)
+def sync_saved_meal_portions(sender, instance, created, **kwargs):
+    """Saved meals follow the pet's current weight, age and activity"""
+    if not created:
+        instance.sync_saved_meals()
+
+
+@receiver(post_save, sender=PetProfile)
+@receiver(post_delete, sender=PetProfile)
+@receiver(post_save, sender=SavedMeal)
+@receiver(post_delete, sender=SavedMeal)
+def household_changed(sender, instance, **kwargs):
+    """Pet and saved meal edits expire the owner's cached household plan once they commit"""
+    transaction.on_commit(partial(bump_household_version, instance.user_id))
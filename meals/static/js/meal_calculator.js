@@ -0,0 +1,156 @@
+/*
+ * Client-side mirror of meals/meal_calculator.py (portions and supply)
+ *
+ * The numbers come from the server: calculator_constants() is served as
+ * versioned JSON at /calculator/constants.<version>.json, so this file only
+ * holds the formulas. Every step follows the Python code operation for
+ * operation (including Python's int(), // and round()) so a live preview
+ * matches what /results/ will show; `manage.py check_calculator_parity`
+ * compares the two over the full weight range.
+ *
+ * Browser: MealCalculator.load(url).then(calc => calc.calculatePortions(...))
+ * Node:    require('./meal_calculator.js').create(constants)
+ */
+(function (root, factory) {
+    if (typeof module === 'object' && module.exports) {
+        module.exports = factory();
+    } else {
+        root.MealCalculator = factory();
+    }
+}(typeof self !== 'undefined' ? self : this, function () {
+    'use strict';
+
+    // Python's float // (floor division), which can differ from
+    // Math.floor(a / b) when the quotient rounds up to a whole number
+    function floorDiv(a, b) {
+        const mod = a % b;
+        let div = (a - mod) / b;
+        if (mod && ((b < 0) !== (mod < 0))) {
+            div -= 1;
+        }
+        let floor = Math.floor(div);
+        if (div - floor > 0.5) {
+            floor += 1;
+        }
+        return floor;
+    }
+
+    // Python's round(x, digits): nearest decimal to the exact binary value,
+    // exact ties to even. toFixed() also works on the exact value but
+    // breaks ties upward, so only ties need fixing.
+    function pyRound(x, digits) {
+        const sign = x < 0 ? -1 : 1;
+        const exact = Math.abs(x).toFixed(100);
+        const point = exact.indexOf('.');
+        const kept = exact.slice(0, point + 1 + digits);
+        const rest = exact.slice(point + 1 + digits);
+        if (/^50*$/.test(rest) && Number(kept.slice(-1)) % 2 === 0) {
+            return sign * Number(kept);
+        }
+        return sign * Number(Math.abs(x).toFixed(digits));
+    }
+
+    function bisectLeft(values, x) {
+        let lo = 0;
+        let hi = values.length;
+        while (lo < hi) {
+            const mid = (lo + hi) >> 1;
+            if (values[mid] < x) {
+                lo = mid + 1;
+            } else {
+                hi = mid;
+            }
+        }
+        return lo;
+    }
+
+    function create(constants) {
+        const chart = constants.calorie_chart;
+        const chartWeights = chart.map(row => row[0]);
+        const first = chart[0];
+        const last = chart[chart.length - 1];
+
+        function getSizeCategory(weight) {
+            for (const [limit, category] of constants.size_category_limits) {
+                if (weight <= limit) {
+                    return category;
+                }
+            }
+            return 'large';
+        }
+
+        function getDailyCalories(weight, activityLevel = 'moderate') {
+            let base;
+            if (weight <= first[0]) {
+                base = [first[1], first[2]];
+            } else if (weight >= last[0]) {
+                // For dogs over 100 lbs, add 40-50 calories per 10 lbs
+                const extraTens = floorDiv(weight - last[0], constants.over_chart_step_lbs);
+                const [extraMin, extraMax] = constants.over_chart_extra_calories;
+                base = [last[1] + extraTens * extraMin, last[2] + extraTens * extraMax];
+            } else {
+                const row = chart[bisectLeft(chartWeights, weight)];
+                base = [row[1], row[2]];
+            }
+
+            const avgCalories = (base[0] + base[1]) / 2;
+            const multiplier = constants.activity_multipliers[activityLevel] ?? 1.0;
+            return Math.trunc(avgCalories * multiplier);
+        }
+
+        function calculatePortions(weight, activityLevel = 'moderate', lifeStage = 'adult') {
+            let dailyCalories = getDailyCalories(weight, activityLevel);
+            dailyCalories = Math.trunc(dailyCalories * (constants.life_stage_multipliers[lifeStage] ?? 1.0));
+
+            const wetCalories = dailyCalories * constants.ratios.wet;
+            const dryCalories = dailyCalories * constants.ratios.dry;
+            const treatCalories = dailyCalories * constants.ratios.treat;
+
+            const wetOz = wetCalories / constants.cal_per_oz.wet;
+            const dryOz = dryCalories / constants.cal_per_oz.dry;
+            const treatOz = treatCalories / constants.cal_per_oz.treat;
+            const dryCups = dryOz / constants.oz_per_cup;
+
+            return {
+                daily_calories: dailyCalories,
+                wet_food_oz: pyRound(wetOz, 1),
+                dry_food_oz: pyRound(dryOz, 1),
+                dry_food_cups: pyRound(dryCups, 2),
+                treat_oz: pyRound(treatOz, 1),
+                treat_calories: Math.trunc(treatCalories),
+            };
+        }
+
+        function calculateSupply(weight, activityLevel = 'moderate', lifeStage = 'adult',
+                                 days = constants.default_supply_days) {
+            const daily = calculatePortions(weight, activityLevel, lifeStage);
+            const wetTotalOz = daily.wet_food_oz * days;
+            const dryTotalOz = daily.dry_food_oz * days;
+            const treatTotalOz = daily.treat_oz * days;
+
+            return {
+                days: days,
+                daily_portions: daily,
+                wet_food_lbs: pyRound(wetTotalOz / constants.oz_per_lb, 1),
+                wet_food_oz: pyRound(wetTotalOz, 1),
+                dry_food_lbs: pyRound(dryTotalOz / constants.oz_per_lb, 1),
+                treat_lbs: pyRound(treatTotalOz / constants.oz_per_lb, 1),
+            };
+        }
+
+        return {constants, getSizeCategory, getDailyCalories, calculatePortions, calculateSupply};
+    }
+
+    function load(url) {
+        return fetch(url, {credentials: 'omit'})
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Calculator constants: HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(create);
+    }
+
+    return {create, load, pyRound, floorDiv};
+}));
@@ -0,0 +1,848 @@
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+
+from .admin import ProductAdmin
+from .cache import get_catalog_version, get_household_version
+from .catalog_io import RowError, import_meals, import_prices, parse_price, parse_product
+from .events import EventBuffer, recommendation_buffer
+from .household import build_household_plan
+from .images import record_derivatives, render_derivatives
+from .meal_calculator import (
+    ACTIVITY_MULTIPLIERS, CALORIE_CHART, LIFE_STAGE_MULTIPLIERS, MAX_PACKAGE_UNITS, MAX_WEIGHT_LBS,
+    PORTION_FIELDS, SUPPLY_FIELDS, SUPPLY_HORIZONS, PackageTable, calculate_45_day_supply, calculate_portions,
+    calculate_portions_batch, calculate_supply, calculator_constants, cheapest_packages, get_daily_calories,
+)
+from .models import (
+    AffiliateClick, ClickRollup, Meal, PackageVariant, PetProfile, Product, ProductPrice, RollupWatermark,
+    SavedMeal,
+)
+from .plans import COST_COLUMNS, package_variants, product_ids, rank_candidates, rank_meals
+from .rollups import ROLLUPS, SAFETY_LAG, fold
+
+
+def make_product(product_type, package_size, price, **fields):
+    return Product.objects.create(
+        brand=fields.pop('brand', 'Acme'),
+        name=fields.pop('name', f'{product_type} {package_size}'),
+        product_type=product_type,
+        calories_per_oz=fields.pop('calories_per_oz', Decimal('95')),
+        package_size=Decimal(package_size),
+        price=Decimal(price),
+        affiliate_link='https://example.com/product',
+        **fields,
+    )
+
+
+def make_meal(dry, wet, treats, size_category='medium', life_stage='adult', **fields):
+    return Meal.objects.create(
+        name=fields.pop('name', f'Meal {dry.pk}-{wet.pk}-{treats.pk}'),
+        brand=fields.pop('brand', 'Acme'),
+        dry_food=dry,
+        wet_food=wet,
+        treats=treats,
+        size_category=size_category,
+        life_stage=life_stage,
+        reference_daily_calories=1000,
+        reference_dry_oz=Decimal('10'),
+        reference_wet_oz=Decimal('5'),
+        reference_treat_oz=Decimal('1'),
+        **fields,
+    )
+
+
+# The calculator as it was before the lookups were memoized and table-driven,
+# kept verbatim so the rewrite can be checked against it
+def legacy_get_daily_calories(weight, activity_level='moderate'):
+    if weight <= 5:
+        base_calories = CALORIE_CHART[5]
+    elif weight >= 100:
+        extra_weight = weight - 100
+        extra_tens = extra_weight // 10
+        base_min, base_max = CALORIE_CHART[100]
+        base_calories = (base_min + (extra_tens * 40), base_max + (extra_tens * 50))
+    else:
+        weights = sorted(CALORIE_CHART.keys())
+        for i, w in enumerate(weights):
+            if weight <= w:
+                base_calories = CALORIE_CHART[w]
+                break
+
+    avg_calories = (base_calories[0] + base_calories[1]) / 2
+    multiplier = ACTIVITY_MULTIPLIERS.get(activity_level, 1.0)
+
+    return int(avg_calories * multiplier)
+
+
+def legacy_calculate_portions(weight, activity_level='moderate', life_stage='adult'):
+    daily_calories = legacy_get_daily_calories(weight, activity_level)
+
+    if life_stage == 'senior':
+        daily_calories = int(daily_calories * 0.90)
+    elif life_stage == 'puppy':
+        daily_calories = int(daily_calories * 1.10)
+
+    wet_calories = daily_calories * 0.25
+    dry_calories = daily_calories * 0.75
+    treat_calories = daily_calories * 0.10
+
+    wet_oz = wet_calories / 25
+    dry_oz = dry_calories / 95
+    treat_oz = treat_calories / 87.5
+
+    dry_cups = dry_oz / 4
+
+    return {
+        'daily_calories': daily_calories,
+        'wet_food_oz': round(wet_oz, 1),
+        'dry_food_oz': round(dry_oz, 1),
+        'dry_food_cups': round(dry_cups, 2),
+        'treat_oz': round(treat_oz, 1),
+        'treat_calories': int(treat_calories),
+    }
+
+
+def legacy_calculate_45_day_supply(weight, activity_level='moderate', life_stage='adult'):
+    daily = legacy_calculate_portions(weight, activity_level, life_stage)
+
+    wet_total_oz = daily['wet_food_oz'] * 45
+    dry_total_oz = daily['dry_food_oz'] * 45
+    treat_total_oz = daily['treat_oz'] * 45
+
+    return {
+        'daily_portions': daily,
+        'wet_food_lbs': round(wet_total_oz / 16, 1),
+        'wet_food_oz': round(wet_total_oz, 1),
+        'dry_food_lbs': round(dry_total_oz / 16, 1),
+        'treat_lbs': round(treat_total_oz / 16, 1),
+    }
+
+
+class CalculatorEquivalenceTests(SimpleTestCase):
+    activity_levels = (*ACTIVITY_MULTIPLIERS, 'unknown')
+    life_stages = (*LIFE_STAGE_MULTIPLIERS, 'unknown')
+
+    def test_matches_legacy_formulas_from_5_to_300_lbs(self):
+        weights = [*range(5, MAX_WEIGHT_LBS + 1), *(w / 2 for w in range(10, MAX_WEIGHT_LBS * 2 + 1))]
+        for weight in weights:
+            for activity_level in self.activity_levels:
+                self.assertEqual(
+                    get_daily_calories(weight, activity_level), legacy_get_daily_calories(weight, activity_level),
+                    (weight, activity_level),
+                )
+                for life_stage in self.life_stages:
+                    args = (weight, activity_level, life_stage)
+                    self.assertEqual(calculate_portions(*args), legacy_calculate_portions(*args), args)
+                    supply = dict(calculate_45_day_supply(*args))
+                    self.assertEqual(supply.pop('days'), 45)
+                    self.assertEqual(supply, legacy_calculate_45_day_supply(*args), args)
+
+
+class BatchCalculatorTests(SimpleTestCase):
+
+    def test_batch_columns_match_scalar_results(self):
+        cases = [
+            (weight, activity_level, life_stage, days)
+            for weight in (*range(1, MAX_WEIGHT_LBS + 1), 2.5, 99.5, 100.5, 117.3)
+            for activity_level in (*ACTIVITY_MULTIPLIERS, 'unknown')
+            for life_stage in (*LIFE_STAGE_MULTIPLIERS, 'unknown')
+            for days in SUPPLY_HORIZONS
+        ]
+        weights, activity_levels, life_stages, days = zip(*cases)
+        batch = calculate_portions_batch(weights, activity_levels, life_stages, days)
+
+        for row, case in enumerate(cases):
+            supply = calculate_supply(*case)
+            portions = {field: batch['portions'][field][row] for field in PORTION_FIELDS}
+            self.assertEqual(portions, supply['daily_portions'], case)
+            self.assertEqual({field: batch['supply'][field][row] for field in SUPPLY_FIELDS},
+                             {field: supply[field] for field in SUPPLY_FIELDS}, case)
+
+    def test_one_horizon_for_everyone(self):
+        batch = calculate_portions_batch([10, 40], ['low', 'high'], ['puppy', 'senior'])
+        self.assertEqual(batch['supply']['dry_food_lbs'],
+                         [calculate_45_day_supply(10, 'low', 'puppy')['dry_food_lbs'],
+                          calculate_45_day_supply(40, 'high', 'senior')['dry_food_lbs']])
+
+    def test_columns_must_be_the_same_length(self):
+        with self.assertRaises(ValueError):
+            calculate_portions_batch([10, 40], ['low'], ['adult', 'adult'])
+
+
+@skipUnless(shutil.which('node'), 'node is not installed')
+class CalculatorParityTests(SimpleTestCase):
+
+    def test_js_matches_python_over_the_full_weight_range(self):
+        out = StringIO()
+        call_command('check_calculator_parity', stdout=out)
+        # 0.1 lb steps plus whole pounds, every activity level and life stage (and an unknown one), every horizon
+        weights = MAX_WEIGHT_LBS * 10 + MAX_WEIGHT_LBS
+        cases = weights * (len(ACTIVITY_MULTIPLIERS) + 1) * (len(LIFE_STAGE_MULTIPLIERS) + 1) * len(SUPPLY_HORIZONS)
+        self.assertIn(f'matches meal_calculator.py on {cases} cases', out.getvalue())
+
+    def test_drifted_constants_are_reported(self):
+        constants = calculator_constants()
+        drifted = dict(constants, ratios=dict(constants['ratios'], wet=constants['ratios']['wet'] + 0.05))
+        with mock.patch('meals.management.commands.check_calculator_parity.calculator_constants',
+                        return_value=drifted):
+            with self.assertRaisesMessage(CommandError, 'cases differ'):
+                call_command('check_calculator_parity', max_weight=10, step=1, stdout=StringIO(), stderr=StringIO())
+
+
+class PackageTableTests(SimpleTestCase):
+
+    def test_cover_is_exact_below_ceiling(self):
+        cost, counts = cheapest_packages(34, ((Decimal('30'), Decimal('50')), (Decimal('4'), Decimal('9'))))
+        self.assertEqual((cost, counts), (Decimal('59.00'), (1, 1)))
+
+    def test_table_stops_growing_at_ceiling(self):
+        # Sizes whose gcd is 0.01 lb: every hundredth would be a table cell
+        table = PackageTable(((Decimal('30.01'), Decimal('50')), (Decimal('4.03'), Decimal('9'))))
+        cents, counts = table.cover(300000 / 16)
+
+        self.assertLessEqual(len(table.cost), MAX_PACKAGE_UNITS + 1)
+        self.assertGreaterEqual(counts[0] * 30.01 + counts[1] * 4.03, 300000 / 16)
+        self.assertEqual(cents, counts[0] * 5000 + counts[1] * 900)
+
+
+class RankMealsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        sizes = ('15', '30', '4.5', '12', '0.75', '2.2')
+        meals = [
+            make_meal(
+                make_product('dry', sizes[i % 6], f'{30 + i * 3}.99'),
+                make_product('wet', sizes[(i + 2) % 6], f'{20 + i}.49', calories_per_oz=Decimal('25')),
+                make_product('treat', sizes[(i + 4) % 6], f'{5 + i % 4}.99', calories_per_oz=Decimal('87.5')),
+                is_featured=i % 5 == 0,
+            )
+            for i in range(12)
+        ]
+        cls.variant_products = {meals[0].dry_food_id, meals[1].treats_id, meals[4].wet_food_id, meals[6].dry_food_id}
+        for product_id in cls.variant_products:
+            PackageVariant.objects.create(product_id=product_id, package_size=Decimal('4.03'), price=Decimal('7.49'))
+
+    def test_sql_ranking_matches_python_costing(self):
+        meals = Meal.objects.candidates('medium', 'adult')
+        rows = list(meals.values('id', *COST_COLUMNS))
+        variants = package_variants(product_ids(rows))
+        for weight in range(5, 301, 7):
+            for days in SUPPLY_HORIZONS:
+                supply = calculate_supply(weight, 'moderate', 'adult', days)
+                expected = rank_candidates(rows, supply, variants, limit=5)
+                ranked, _ = rank_meals(meals, supply, limit=5)
+                self.assertEqual(ranked, expected)
+
+    def test_only_meals_with_variants_are_loaded(self):
+        supply = calculate_supply(40, 'moderate', 'adult', 45)
+        with self.assertNumQueries(3):
+            ranked, variants = rank_meals(Meal.objects.candidates('medium', 'adult'), supply, limit=3)
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(set(variants), self.variant_products)
+
+
+# Templates are rendered without a collectstatic manifest
+PLAIN_STATIC_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+
+
+@override_settings(STATICFILES_STORAGE=PLAIN_STATIC_STORAGE)
+@mock.patch.object(recommendation_buffer, 'record')
+class ResultsQueryBudgetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(15):
+            meal = make_meal(
+                make_product('dry', '30', f'{40 + i}.99'),
+                make_product('wet', '12', f'{20 + i}.49', calories_per_oz=Decimal('25')),
+                make_product('treat', '16', '8.99', calories_per_oz=Decimal('87.5')),
+            )
+            if i % 4 == 0:
+                PackageVariant.objects.create(product=meal.dry_food, package_size=Decimal('4'), price=Decimal('9.99'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_results_page_query_budget(self, record):
+        # Last-Modified (product and meal, cached afterwards), meals ranked in
+        # SQL, meals with variants, their variants, the ten meals with products
+        with self.assertNumQueries(6):
+            response = self.client.get('/results/', {'weight': 40}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['recommendations']), 10)
+        self.assertEqual(record.call_count, 10)
+
+    def test_cached_results_page_needs_no_queries(self, record):
+        self.client.get('/results/', {'weight': 40}, secure=True)
+        with self.assertNumQueries(0):
+            response = self.client.get('/results/', {'weight': 40}, secure=True)
+        self.assertEqual(response.status_code, 200)
+
+
+class WeightBoundTests(TestCase):
+
+    def test_results_rejects_weight_over_max(self):
+        response = self.client.get('/results/', {'weight': MAX_WEIGHT_LBS + 1}, secure=True)
+        self.assertRedirects(response, '/finder/', fetch_redirect_response=False)
+
+    def test_api_rejects_weight_over_max(self):
+        response = self.client.get('/api/recommendations/', {'weight': MAX_WEIGHT_LBS + 1}, secure=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class VersionBumpTests(TestCase):
+
+    def test_catalog_version_bumps_after_commit(self):
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_product('dry', '30', '49.99')
+            self.assertEqual(get_catalog_version(), before)
+        self.assertNotEqual(get_catalog_version(), before)
+
+    def test_household_version_bumps_after_commit(self):
+        user = User.objects.create_user('owner')
+        before = get_household_version(user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            PetProfile.objects.create(user=user, name='Rex', weight=40, age_months=30, life_stage='adult')
+            self.assertEqual(get_household_version(user.pk), before)
+        self.assertNotEqual(get_household_version(user.pk), before)
+
+
+class SavedMealSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        meals = [
+            make_meal(make_product('dry', '30', '49.99'), make_product('wet', '12', '24.99'),
+                      make_product('treat', '16', '8.99'))
+            for _ in range(2)
+        ]
+        cls.rex = PetProfile.objects.create(user=cls.user, name='Rex', weight=40, age_months=30, life_stage='adult')
+        cls.fido = PetProfile.objects.create(user=cls.user, name='Fido', weight=12, age_months=30, life_stage='adult')
+        for pet in (cls.rex, cls.fido):
+            for meal in meals:
+                SavedMeal.objects.create(user=cls.user, pet=pet, meal=meal, **cls.portions(pet))
+
+    @staticmethod
+    def portions(pet):
+        return SavedMeal.portion_values(calculate_portions(pet.weight, pet.activity_level, pet.life_stage))
+
+    def stored(self, pet):
+        return [
+            dict(zip(SavedMeal.PORTION_FIELDS, row))
+            for row in pet.savedmeal_set.order_by('pk').values_list(*SavedMeal.PORTION_FIELDS)
+        ]
+
+    def make_stale(self, pet, **values):
+        pet.savedmeal_set.update(**dict(daily_calories=1, dry_food_oz=Decimal('1.00'), **values))
+
+    def test_editing_a_pet_updates_only_its_saved_meals(self):
+        self.make_stale(self.fido)
+        fido_before = self.stored(self.fido)
+
+        self.rex.weight = 75
+        self.rex.activity_level = 'high'
+        with CaptureQueriesContext(connection) as queries:
+            self.rex.save()
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "meals_savedmeal"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.stored(self.rex), [self.portions(self.rex)] * 2)
+        self.assertEqual(self.stored(self.fido), fido_before)
+
+    def test_unchanged_portions_are_not_rewritten(self):
+        self.rex.name = 'Rex II'
+        self.assertEqual(self.rex.sync_saved_meals(), 0)
+        self.rex.age_months = 120
+        self.rex.life_stage = 'senior'
+        self.assertEqual(self.rex.sync_saved_meals(), 2)
+
+    def test_edit_pet_view_updates_saved_meals(self):
+        self.client.force_login(self.user)
+        response = self.client.post(f'/accounts/pet/{self.fido.pk}/edit/', {
+            'name': 'Fido', 'weight': 55, 'age_months': 30, 'activity_level': 'low', 'supply_days': 30,
+        }, secure=True)
+        self.assertEqual(response.status_code, 302)
+
+        self.fido.refresh_from_db()
+        expected = self.portions(self.fido)
+        self.assertEqual(expected, SavedMeal.portion_values(calculate_portions(55, 'low', 'adult')))
+        self.assertEqual(self.stored(self.fido), [expected] * 2)
+
+    def test_resync_command_is_repeatable(self):
+        self.make_stale(self.rex)
+        self.make_stale(self.fido, treat_oz=Decimal('9.00'))
+
+        out = StringIO()
+        call_command('resync_saved_meals', batch_size=3, stdout=out)
+        self.assertIn('Updated portions on 4 saved meals', out.getvalue())
+        synced = [self.stored(self.rex), self.stored(self.fido)]
+        self.assertEqual(synced, [[self.portions(self.rex)] * 2, [self.portions(self.fido)] * 2])
+
+        out = StringIO()
+        call_command('resync_saved_meals', batch_size=3, stdout=out)
+        self.assertIn('Updated portions on 0 saved meals', out.getvalue())
+        self.assertEqual([self.stored(self.rex), self.stored(self.fido)], synced)
+
+
+class HouseholdPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner')
+        cls.dry = make_product('dry', '30', '50.00')
+        cls.wet = make_product('wet', '12', '20.00', calories_per_oz=Decimal('25'))
+        cls.treats = make_product('treat', '16', '10.00', calories_per_oz=Decimal('87.5'))
+        cls.meal = make_meal(cls.dry, cls.wet, cls.treats)
+
+    def add_pet(self, name, weight, meal=None):
+        pet = PetProfile.objects.create(user=self.user, name=name, weight=weight, age_months=30, life_stage='adult')
+        if meal:
+            SavedMeal.objects.create(
+                user=self.user, pet=pet, meal=meal,
+                **SavedMeal.portion_values(calculate_portions(pet.weight, pet.activity_level, pet.life_stage)),
+            )
+        return pet
+
+    def test_shared_products_are_bought_together(self):
+        # 45 days: Rex (40 lbs) needs 20.8 lbs dry, 26.4 wet, 3.1 treats;
+        # Fido (20 lbs) 12.1 dry, 15.5 wet, 1.7 treats
+        self.add_pet('Rex', 40, self.meal)
+        self.add_pet('Fido', 20, self.meal)
+        plan = build_household_plan(self.user)
+
+        self.assertEqual([(pet['name'], pet['source']) for pet in plan['pets']],
+                         [('Fido', 'saved'), ('Rex', 'saved')])
+        self.assertEqual(
+            [(item['product']['id'], item['lbs_needed'], item['quantity'], item['cost'], item['pets'])
+             for item in plan['shopping_list']],
+            [
+                (self.dry.pk, 32.9, 2, Decimal('100.00'), ['Fido', 'Rex']),
+                (self.wet.pk, 41.9, 4, Decimal('80.00'), ['Fido', 'Rex']),
+                (self.treats.pk, 4.8, 1, Decimal('10.00'), ['Fido', 'Rex']),
+            ],
+        )
+        # Apart: dry 1 + 1 bags, wet 3 + 2, treats 1 + 1
+        self.assertEqual(plan['separate_cost'], Decimal('220.00'))
+        self.assertEqual(plan['total_cost'], Decimal('190.00'))
+        self.assertEqual(plan['savings'], Decimal('30.00'))
+        self.assertEqual(plan['cost_per_day'], Decimal('190.00') / 45)
+
+    def test_only_shared_products_are_merged(self):
+        other_wet = make_product('wet', '6', '9.00', calories_per_oz=Decimal('25'))
+        self.add_pet('Rex', 40, self.meal)
+        self.add_pet('Fido', 20, make_meal(self.dry, other_wet, self.treats))
+        plan = build_household_plan(self.user, days=30)
+
+        items = {item['product']['id']: item for item in plan['shopping_list']}
+        self.assertEqual(len(items), 4)
+        self.assertEqual(items[self.dry.pk]['pets'], ['Fido', 'Rex'])
+        self.assertEqual((items[self.wet.pk]['pets'], items[other_wet.pk]['pets']), (['Rex'], ['Fido']))
+        self.assertEqual(plan['days'], 30)
+        self.assertEqual(plan['cost_per_day'], plan['total_cost'] / 30)
+
+    def test_pets_without_a_saved_meal_get_the_cheapest(self):
+        pricier = make_meal(make_product('dry', '30', '80.00'), self.wet, self.treats)
+        self.add_pet('Rex', 40, pricier)
+        self.add_pet('Max', 45)
+        plan = build_household_plan(self.user)
+
+        choices = {pet['name']: (pet['meal']['id'], pet['source']) for pet in plan['pets']}
+        self.assertEqual(choices, {'Rex': (pricier.pk, 'saved'), 'Max': (self.meal.pk, 'recommended')})
+        self.assertEqual(plan['savings'], plan['separate_cost'] - plan['total_cost'])
+
+
+class CatalogParseTests(SimpleTestCase):
+    row = {
+        'sku': 'ACME-1', 'brand': 'Acme', 'name': 'Kibble', 'product_type': 'dry',
+        'calories_per_oz': '95', 'package_size': '30', 'price': '49.99',
+        'affiliate_link': 'https://example.com/kibble',
+    }
+
+    def test_valid_amounts_are_rounded_to_cents(self):
+        values = parse_product(dict(self.row, package_size='4.005', price='12.345'))
+        self.assertEqual((values['package_size'], values['price']), (Decimal('4.00'), Decimal('12.34')))
+
+    def test_out_of_range_amounts_are_rejected(self):
+        for key, value in [
+            ('package_size', '0'), ('package_size', '0.001'), ('package_size', '-4'),
+            ('package_size', '10000'), ('price', '-1'), ('price', '1000000'), ('price', '1e30'),
+            ('calories_per_oz', '1000'),
+        ]:
+            with self.subTest(key=key, value=value), self.assertRaisesMessage(RowError, key):
+                parse_product(dict(self.row, **{key: value}))
+
+    def test_price_feed_uses_the_same_bounds(self):
+        with self.assertRaises(RowError):
+            parse_price({'sku': 'ACME-1', 'price': '1e30'})
+
+
+class PriceHistoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.meal = make_meal(make_product('dry', '30', '49.99'), make_product('wet', '12', '24.99'),
+                             make_product('treat', '16', '8.99'))
+        cls.dry, cls.wet = cls.meal.dry_food, cls.meal.wet_food
+
+    def feed(self, *prices):
+        return [(line, {'sku': sku, 'price': price}) for line, (sku, price) in enumerate(prices, start=2)]
+
+    def test_unchanged_prices_write_nothing(self):
+        history = ProductPrice.objects.count()
+        # Only the diff query
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks() as callbacks:
+            stats = import_prices(self.feed((self.dry.sku, '49.99'), (self.wet.sku, '24.990')))
+
+        self.assertEqual((stats.unchanged, stats.updated, stats.errors), (2, 0, []))
+        self.assertEqual(ProductPrice.objects.count(), history)
+        self.assertEqual(callbacks, [])
+
+    def test_changed_price_adds_one_history_row(self):
+        history = ProductPrice.objects.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = import_prices(self.feed((self.dry.sku, '44.50'), (self.wet.sku, '24.99'), ('NOPE', '1')))
+
+        self.assertEqual((stats.unchanged, stats.updated), (1, 1))
+        self.assertEqual(stats.errors, [(4, 'unknown product sku: NOPE')])
+        self.assertEqual(ProductPrice.objects.count(), history + 1)
+        latest = ProductPrice.objects.latest('recorded_at')
+        self.assertEqual((latest.product_id, latest.price), (self.dry.pk, Decimal('44.50')))
+        self.dry.refresh_from_db()
+        self.meal.refresh_from_db()
+        self.assertEqual((self.dry.price, self.meal.dry_price), (Decimal('44.50'), Decimal('44.50')))
+
+        # Applying the same feed again is a no-op
+        stats = import_prices(self.feed((self.dry.sku, '44.50')))
+        self.assertEqual((stats.unchanged, ProductPrice.objects.count()), (1, history + 1))
+
+    def test_refresh_prices_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as feed:
+            feed.write(f'sku,price\n{self.dry.sku},47.00\n{self.wet.sku},24.99\n')
+        self.addCleanup(os.unlink, feed.name)
+        out = StringIO()
+        call_command('refresh_prices', feed.name, stdout=out)
+        self.assertIn('1 changed, 1 unchanged', out.getvalue())
+
+    def test_saves_record_only_price_changes(self):
+        history = self.dry.price_history.count()
+        self.dry.name = 'Renamed'
+        self.dry.save()
+        self.assertEqual(self.dry.price_history.count(), history)
+        self.dry.price = Decimal('39.99')
+        self.dry.save()
+        self.assertEqual(self.dry.price_history.count(), history + 1)
+
+    def test_lowest_price_since(self):
+        # Created at 49.99 (recorded now); earlier history below
+        now = timezone.now()
+        for days_ago, price in ((40, '42.00'), (20, '47.00'), (5, '44.00')):
+            ProductPrice.objects.create(
+                product=self.dry, price=Decimal(price), recorded_at=now - timedelta(days=days_ago),
+            )
+
+        def lowest(days_ago):
+            return self.dry.lowest_price_since(now - timedelta(days=days_ago))
+
+        # 42.00 was still in effect when a 30-day window opened
+        self.assertEqual(lowest(30), Decimal('42.00'))
+        # 47.00 in effect at the start, 44.00 during the window
+        self.assertEqual(lowest(10), Decimal('44.00'))
+        self.assertEqual(lowest(1), Decimal('44.00'))
+        self.assertEqual(self.dry.lowest_price_since(now + timedelta(seconds=1)), Decimal('49.99'))
+
+
+class CatalogRoundTripTests(TestCase):
+
+    def test_export_can_be_imported_back(self):
+        meal = make_meal(make_product('dry', '30', '49.99'), make_product('wet', '12', '24.99'),
+                         make_product('treat', '16', '8.99'))
+        self.assertEqual(meal.dry_food.sku, f'PFH-{meal.dry_food_id}')
+
+        with tempfile.TemporaryDirectory() as directory:
+            for model in ('products', 'meals'):
+                path = os.path.join(directory, f'{model}.csv')
+                call_command('export_catalog', model, path, stdout=StringIO())
+                out, err = StringIO(), StringIO()
+                call_command('import_catalog', model, path, stdout=out, stderr=err)
+                self.assertEqual(err.getvalue(), '')
+                self.assertIn('0 created', out.getvalue())
+
+    def test_new_meals_with_feed_ids_advance_the_id_sequence(self):
+        meal = make_meal(make_product('dry', '30', '49.99'), make_product('wet', '12', '24.99'),
+                         make_product('treat', '16', '8.99'))
+        row = {
+            'name': 'Imported', 'brand': 'Acme', 'dry_food_sku': meal.dry_food.sku,
+            'wet_food_sku': meal.wet_food.sku, 'treats_sku': meal.treats.sku, 'size_category': 'medium',
+            'life_stage': 'adult', 'reference_daily_calories': '1000', 'reference_dry_oz': '10',
+            'reference_wet_oz': '5', 'reference_treat_oz': '1',
+        }
+        reset = mock.Mock(wraps=connection.ops.sequence_reset_sql)
+        with mock.patch.object(connection.ops, 'sequence_reset_sql', reset):
+            stats = import_meals([(1, dict(row, id=str(meal.pk + 1000))), (2, row)])
+
+        self.assertEqual((stats.created, stats.errors), (2, []))
+        reset.assert_called_once_with(mock.ANY, [Meal])
+        self.assertTrue(Meal.objects.filter(pk=meal.pk + 1000, name='Imported').exists())
+        self.assertEqual(Meal.objects.get(pk=meal.pk + 1001).name, 'Imported')
+        self.assertGreater(make_meal(meal.dry_food, meal.wet_food, meal.treats).pk, meal.pk + 1001)
+
+    def test_unreadable_feed_is_a_command_error(self):
+        with self.assertRaises(CommandError):
+            call_command('import_catalog', 'products', '/nonexistent/feed.csv')
+
+
+@mock.patch.object(EventBuffer, '_start')  # no writer thread; tests flush explicitly
+class AffiliateClickTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.meal = make_meal(make_product('dry', '30', '49.99'), make_product('wet', '12', '24.99'),
+                             make_product('treat', '16', '8.99'))
+        cls.product = cls.meal.dry_food
+
+    def setUp(self):
+        cache.clear()
+        self.buffer = EventBuffer('meals.AffiliateClick')
+        patcher = mock.patch('meals.views.click_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def click(self, product_id, **params):
+        return self.client.get(f'/go/{product_id}/', params, secure=True, HTTP_REFERER='https://partner.example/')
+
+    def test_click_redirects_and_is_written_on_flush(self, start):
+        response = self.click(self.product.pk, meal=self.meal.pk, size='large')
+
+        self.assertRedirects(response, self.product.affiliate_link, fetch_redirect_response=False)
+        self.assertFalse(AffiliateClick.objects.exists())
+        self.assertEqual(self.buffer.flush(), 1)
+        click = AffiliateClick.objects.get()
+        self.assertEqual(
+            (click.product_id, click.meal_id, click.size_category, click.referrer),
+            (self.product.pk, self.meal.pk, 'large', 'https://partner.example/'),
+        )
+
+    def test_unknown_product_is_404(self, start):
+        self.assertEqual(self.click(self.product.pk + 1000).status_code, 404)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_size_and_meal_parsing(self, start):
+        cases = [
+            ({'size': 'small', 'weight': 80}, None, 'small'),
+            ({'size': 'huge', 'weight': 80}, None, 'large'),
+            ({'weight': 'heavy'}, None, ''),
+            ({'meal': 'abc'}, None, ''),
+            ({'meal': self.meal.pk, 'weight': 20}, self.meal.pk, 'small'),
+        ]
+        for params, _, _ in cases:
+            self.assertEqual(self.click(self.product.pk, **params).status_code, 302, params)
+        self.assertEqual(self.buffer.flush(), len(cases))
+
+        clicks = AffiliateClick.objects.order_by('pk').values_list('meal_id', 'size_category')
+        self.assertEqual(list(clicks), [(meal_id, size) for _, meal_id, size in cases])
+
+    def test_flush_writes_in_batches(self, start):
+        self.buffer.batch_size = 3
+        for _ in range(7):
+            self.click(self.product.pk)
+        self.assertTrue(self.buffer._wake.is_set())
+
+        bulk_create = AffiliateClick.objects.bulk_create
+        with mock.patch.object(AffiliateClick.objects, 'bulk_create', wraps=bulk_create) as bulk:
+            self.assertEqual(self.buffer.flush(), 7)
+        self.assertEqual([len(call.args[0]) for call in bulk.call_args_list], [3, 3, 1])
+        self.assertEqual(AffiliateClick.objects.count(), 7)
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_failed_flush_keeps_events(self, start):
+        self.click(self.product.pk, size='small')
+        self.click(self.product.pk, size='large')
+        with mock.patch.object(AffiliateClick.objects, 'bulk_create', side_effect=OperationalError), \
+                self.assertRaises(OperationalError):
+            self.buffer.flush()
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(list(AffiliateClick.objects.order_by('pk').values_list('size_category', flat=True)),
+                         ['small', 'large'])
+
+    def test_orphaned_events_are_fixed_or_dropped(self, start):
+        now = timezone.now()
+        events = [
+            AffiliateClick(product_id=self.product.pk, meal_id=self.meal.pk + 1000, clicked_at=now),
+            AffiliateClick(product_id=self.product.pk + 1000, meal_id=self.meal.pk, clicked_at=now),
+        ]
+        kept = self.buffer._drop_orphans(AffiliateClick, events)
+        self.assertEqual([(e.product_id, e.meal_id) for e in kept], [(self.product.pk, None)])
+
+
+class ImageDerivativeTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, name, mode, size, color):
+        buffer = BytesIO()
+        Image.new(mode, size, color).save(buffer, 'PNG')
+        return default_storage.save(f'products/{name}', ContentFile(buffer.getvalue()))
+
+    def open(self, name):
+        with default_storage.open(name, 'rb') as f:
+            image = Image.open(f)
+            image.load()
+        return image
+
+    def test_every_width_in_both_formats(self):
+        source = self.upload('kibble.png', 'RGB', (400, 300), 'brown')
+        derived = render_derivatives(source)
+
+        self.assertEqual(derived['source'], source)
+        for fmt, pil_format in (('jpeg', 'JPEG'), ('webp', 'WEBP')):
+            self.assertEqual([width for width, _ in derived[fmt]], [80, 160, 320])
+            for width, name in derived[fmt]:
+                image = self.open(name)
+                self.assertEqual((image.format, image.size), (pil_format, (width, width * 3 // 4)))
+
+    def test_small_images_are_not_upscaled(self):
+        derived = render_derivatives(self.upload('treat.png', 'RGB', (100, 50), 'red'))
+        self.assertEqual([width for width, _ in derived['webp']], [80, 100])
+        self.assertEqual(self.open(derived['webp'][-1][1]).size, (100, 50))
+
+    def test_transparency_is_kept_in_webp_and_flattened_in_jpeg(self):
+        for mode, color in (('RGBA', (200, 0, 0, 0)), ('LA', (128, 0))):
+            with self.subTest(mode=mode):
+                derived = render_derivatives(self.upload(f'{mode}.png', mode, (200, 200), color))
+                webp = self.open(derived['webp'][0][1])
+                self.assertEqual(webp.mode, 'RGBA')
+                self.assertEqual(webp.getpixel((10, 10))[3], 0)
+                jpeg = self.open(derived['jpeg'][0][1])
+                self.assertEqual(jpeg.mode, 'RGB')
+                self.assertTrue(all(channel > 240 for channel in jpeg.getpixel((10, 10))))
+
+    def test_record_derivatives(self):
+        source = self.upload('kibble.png', 'RGB', (400, 300), 'brown')
+        product, replaced = make_product('dry', '30', '49.99'), make_product('dry', '15', '29.99')
+        Product.objects.filter(pk__in=[product.pk, replaced.pk]).update(image=source)
+        Product.objects.filter(pk=replaced.pk).update(image='products/newer.png')
+        derived = render_derivatives(source)
+
+        before = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(record_derivatives({product.pk: derived, replaced.pk: derived}), 1)
+        self.assertNotEqual(get_catalog_version(), before)
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_derivatives, derived)
+        self.assertEqual(product.thumbnail_url, default_storage.url(derived['jpeg'][0][1]))
+        self.assertEqual(product.webp_srcset.count('w, '), 2)
+        self.assertIn(f'srcset="{product.webp_srcset}"', ProductAdmin(Product, admin.site).image_preview(product))
+        replaced.refresh_from_db()
+        self.assertEqual(replaced.image_derivatives, {})
+        self.assertEqual(replaced.thumbnail_url, replaced.image.url)
+
+    def test_pages_serve_no_product_images(self):
+        product = make_product('dry', '30', '49.99', image=self.upload('kibble.png', 'RGB', (400, 300), 'brown'))
+        meal = make_meal(product, make_product('wet', '12', '24.99'), make_product('treat', '16', '8.99'),
+                         is_featured=True)
+        cache.clear()
+        with override_settings(STATICFILES_STORAGE=PLAIN_STATIC_STORAGE), \
+                mock.patch.object(recommendation_buffer, 'record'):
+            for path in ('/', '/results/?weight=40', f'/meal/{meal.pk}/'):
+                response = self.client.get(path, secure=True)
+                self.assertContains(response, meal.name)
+                self.assertNotContains(response, '/media/products/')
+
+
+class RollupWatermarkTests(TestCase):
+
+    def test_watermark_stops_before_recent_events(self):
+        product = make_product('dry', '30', '49.99')
+        now = timezone.now()
+        old = now - SAFETY_LAG * 2
+
+        def click(clicked_at):
+            return AffiliateClick.objects.create(product=product, size_category='medium', clicked_at=clicked_at)
+
+        first = click(old)
+        click(now)  # may still have uncommitted neighbours with lower ids
+        click(old)  # flushed late, behind the recent event
+
+        clicks = ROLLUPS[0]
+        self.assertEqual(fold(clicks, now=now), 1)
+        self.assertEqual(RollupWatermark.objects.get(name='clicks').last_event_id, first.pk)
+        self.assertEqual(fold(clicks, now=now), 0)
+
+        self.assertEqual(fold(clicks, now=now + SAFETY_LAG * 2), 2)
+        self.assertEqual(ClickRollup.objects.filter(granularity='day').aggregate(total=Sum('clicks'))['total'], 3)
+
+
+class HashedStaticTests(TestCase):
+
+    def test_templates_link_hashed_precompressed_files(self):
+        with tempfile.TemporaryDirectory() as static_root, override_settings(
+            STATICFILES_STORAGE='whitenoise.storage.CompressedManifestStaticFilesStorage',
+            STATIC_ROOT=static_root,
+        ):
+            # Only this project's files; admin assets would just slow the build
+            call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+            content = self.client.get('/finder/', secure=True).content.decode()
+
+            for name, ext in (('css/style', 'css'), ('js/meal_calculator', 'js')):
+                match = re.search(rf'/static/({re.escape(name)}\.[0-9a-f]{{12}}\.{ext})"', content)
+                self.assertIsNotNone(match, f'{name}.{ext} is not linked by its hashed name')
+                for suffix in ('', '.gz', '.br'):
+                    self.assertTrue(os.path.exists(os.path.join(static_root, match[1] + suffix)), match[1] + suffix)
+
+
+class PackageBenchmarkTests(SimpleTestCase):
+
+    def test_benchmark_reports_time_per_meal(self):
+        out = StringIO()
+        call_command('benchmark', 'packages', repeat=1, stdout=out)
+        self.assertRegex(out.getvalue(), r'warm tables, per meal +[0-9.]+ us')
+
+
+@override_settings(STATICFILES_STORAGE=PLAIN_STATIC_STORAGE)
+class RequestBenchmarkTests(TestCase):
+
+    def test_query_benchmark_leaves_no_data_behind(self):
+        out = StringIO()
+        call_command('benchmark', 'queries', stdout=out)
+
+        self.assertRegex(out.getvalue(), r'configured: logged-in dashboard +\d+ queries')
+        self.assertRegex(out.getvalue(), r'db sessions: logged-in dashboard +\d+ queries')
+        self.assertFalse(Meal.objects.exists() or User.objects.exists())
+        self.assertTrue(recommendation_buffer.enabled)
+
+    def test_render_benchmark_times_every_page(self):
+        out = StringIO()
+        call_command('benchmark', 'render', repeat=1, stdout=out)
+
+        for config in ('configured', 'no cache', 'uncached loader'):
+            for page in ('home', 'results, weight varies', 'results, same dog', 'meal detail'):
+                self.assertRegex(out.getvalue(), rf'{config}: {page} +[0-9.]+ ms')
+        self.assertFalse(Meal.objects.exists())
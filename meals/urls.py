@@ -6,9 +6,11 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('', views.home, name='home'),
     path('finder/', views.meal_finder, name='meal_finder'),
+    path('calculator/constants.<str:version>.json', views.calculator_constants_json, name='calculator_constants'),
     path('results/', views.meal_results, name='meal_results'),
     path('meal/<int:meal_id>/', views.meal_detail, name='meal_detail'),  # FIXED
     path('meal/<int:meal_id>/save/', views.save_meal, name='save_meal'),  # FIXED
+    path('go/<int:product_id>/', views.affiliate_click, name='affiliate_click'),
 ]
 
 if settings.DEBUG:
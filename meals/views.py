@@ -1,34 +1,129 @@
+from functools import wraps
+
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 from .models import Meal, Product, SavedMeal, PetProfile
-from .meal_calculator import calculate_portions, calculate_45_day_supply, recommend_package_sizes
+from .meal_calculator import (
+    CALCULATOR_VERSION, DEFAULT_SUPPLY_DAYS, MAX_WEIGHT_LBS, SUPPLY_HORIZONS, calculate_portions,
+    calculate_supply, calculator_constants, get_size_category, recommend_package_sizes,
+)
+from .cache import cache_catalog_page, conditional_catalog_page, get_affiliate_link, get_catalog_version
+from .events import click_buffer, recommendation_buffer
+from .fragments import render_meal_cards
+from .plans import package_variants, rank_meals
 
 
+@conditional_catalog_page(lambda request: ())
 def home(request):
     """Landing page"""
+    # Lazy: not queried at all while the template's featured fragment is cached
     featured_meals = Meal.objects.filter(is_featured=True, is_active=True)[:6]
     context = {
         'featured_meals': featured_meals,
+        'catalog_version': get_catalog_version(),
     }
     return render(request, 'meals/home.html', context)
 
 
 def meal_finder(request):
     """Interactive meal finder - step-by-step form"""
-    context = {}
+    context = {
+        'supply_horizons': SUPPLY_HORIZONS,
+        'default_supply_days': DEFAULT_SUPPLY_DAYS,
+        'calculator_version': CALCULATOR_VERSION,
+    }
     return render(request, 'meals/meal_finder.html', context)
 
 
+def calculator_constants_json(request, version):
+    """
+    Constants for the client-side calculator (static/js/meal_calculator.js)
+    The URL carries their content hash, so browsers can keep it forever.
+    """
+    if version != CALCULATOR_VERSION:
+        # Page rendered before the constants changed
+        return redirect('calculator_constants', version=CALCULATOR_VERSION)
+    response = JsonResponse(calculator_constants())
+    patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    return response
+
+
+def _supply_days(request):
+    """Shopping horizon from ?days=, falling back to the default for unknown values"""
+    try:
+        days = int(request.GET.get('days', DEFAULT_SUPPLY_DAYS))
+    except ValueError:
+        return DEFAULT_SUPPLY_DAYS
+    return days if days in SUPPLY_HORIZONS else DEFAULT_SUPPLY_DAYS
+
+
+def _weight(request, default):
+    """?weight= in whole pounds, or default when missing, malformed or over MAX_WEIGHT_LBS"""
+    try:
+        weight = int(request.GET.get('weight', default))
+    except ValueError:
+        return default
+    return weight if weight <= MAX_WEIGHT_LBS else default
+
+
+def _results_params(request):
+    """Normalized finder inputs: (weight, life_stage, activity_level, preference, days)"""
+    return (
+        _weight(request, 0),
+        request.GET.get('life_stage', 'adult'),
+        request.GET.get('activity_level', 'moderate'),
+        request.GET.get('preference', ''),
+        _supply_days(request),
+    )
+
+
+def _detail_params(request, meal_id):
+    """Normalized detail inputs: (meal_id, weight, activity_level, days)"""
+    return (
+        meal_id,
+        _weight(request, 30),
+        request.GET.get('activity_level', 'moderate'),
+        _supply_days(request),
+    )
+
+
+def record_recommendations(view):
+    """
+    Buffer a RecommendationEvent for each meal a results page shows. The
+    view tags its response with the meals it ranked; the tag survives the
+    page cache, so cached hits are counted too.
+    """
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        shown = getattr(response, 'recommended_meals', None)
+        if shown:
+            now = timezone.now()
+            for position, meal_id in enumerate(shown['meal_ids'], start=1):
+                recommendation_buffer.record(
+                    meal_id=meal_id,
+                    size_category=shown['size_category'],
+                    life_stage=shown['life_stage'],
+                    position=position,
+                    shown_at=now,
+                )
+        return response
+    return wrapped
+
+
+@conditional_catalog_page(_results_params)
+@record_recommendations
+@cache_catalog_page(_results_params)
 def meal_results(request):
     """Show recommended meals based on user selections"""
     
     # Get user inputs
-    weight = int(request.GET.get('weight', 0))
-    life_stage = request.GET.get('life_stage', 'adult')
-    activity_level = request.GET.get('activity_level', 'moderate')
-    preference = request.GET.get('preference', '')
+    weight, life_stage, activity_level, preference, days = _results_params(request)
     
     # Validate inputs
     if not weight or weight < 5:
@@ -36,74 +131,71 @@ def meal_results(request):
         return redirect('meal_finder')
     
     # Determine size category
-    if weight <= 25:
-        size_category = 'small'
-    elif weight <= 60:
-        size_category = 'medium'
-    else:
-        size_category = 'large'
+    size_category = get_size_category(weight)
     
     # Calculate nutritional needs
     portions = calculate_portions(weight, activity_level, life_stage)
-    supply_45_day = calculate_45_day_supply(weight, activity_level, life_stage)
+    supply = calculate_supply(weight, activity_level, life_stage, days)
     
-    # Filter meals
-    meals = Meal.objects.filter(
-        size_category=size_category,
-        life_stage=life_stage,
-        is_active=True
+    # Cheapest package mix first (budget-friendly first)
+    ranked, variants = rank_meals(
+        Meal.objects.candidates(size_category, life_stage, preference), supply, limit=10,  # Limit to top 10 options
     )
-    
-    # Apply preference filter if specified
-    if preference:
-        meals = meals.filter(preference_tags__icontains=preference)
+    meals = Meal.objects.select_related('dry_food', 'wet_food', 'treats').in_bulk([row['id'] for row in ranked])
+    # Shopping list cards come from the fragment cache when these quantities were seen before
+    cards = render_meal_cards([meals[row['id']] for row in ranked], supply, variants)
     
     # Prepare meal recommendations with calculated portions
     recommendations = []
-    for meal in meals[:10]:  # Limit to top 10 options
-        shopping_list = recommend_package_sizes(supply_45_day, meal)
-        
-        # Calculate total cost
-        total_cost = (
-            shopping_list['dry_food']['quantity'] * float(meal.dry_food.price) +
-            shopping_list['wet_food']['quantity'] * float(meal.wet_food.price) +
-            shopping_list['treats']['quantity'] * float(meal.treats.price)
-        )
+    for row in ranked:
+        meal = meals[row['id']]
         
         recommendations.append({
             'meal': meal,
-            'shopping_list': shopping_list,
-            'total_cost': round(total_cost, 2),
-            'cost_per_day': round(total_cost / 45, 2),
+            'card': cards[meal.id],
+            'total_cost': round(float(row['total_cost']), 2),
+            'cost_per_day': round(float(row['cost_per_day']), 2),
         })
     
-    # Sort by cost (budget-friendly first)
-    recommendations.sort(key=lambda x: x['total_cost'])
-    
     context = {
         'weight': weight,
         'life_stage': life_stage,
         'activity_level': activity_level,
+        'preference': preference,
+        'days': days,
+        'supply_horizons': SUPPLY_HORIZONS,
         'portions': portions,
         'recommendations': recommendations,
     }
     
-    return render(request, 'meals/meal_results.html', context)
+    response = render(request, 'meals/meal_results.html', context)
+    response.recommended_meals = {
+        'size_category': size_category,
+        'life_stage': life_stage,
+        'meal_ids': [rec['meal'].id for rec in recommendations],
+    }
+    return response
 
 
+@conditional_catalog_page(_detail_params)
+@cache_catalog_page(_detail_params)
 def meal_detail(request, meal_id):
     """Detailed view of a specific meal"""
-    meal = get_object_or_404(Meal, id=meal_id, is_active=True)
+    meal = get_object_or_404(
+        Meal.objects.select_related('dry_food', 'wet_food', 'treats'),
+        id=meal_id,
+        is_active=True,
+    )
     
     # Get weight from query params or use default
-    weight = int(request.GET.get('weight', 30))
-    activity_level = request.GET.get('activity_level', 'moderate')
+    _, weight, activity_level, days = _detail_params(request, meal_id)
     life_stage = meal.life_stage
     
     # Calculate portions
     portions = calculate_portions(weight, activity_level, life_stage)
-    supply_45_day = calculate_45_day_supply(weight, activity_level, life_stage)
-    shopping_list = recommend_package_sizes(supply_45_day, meal)
+    supply = calculate_supply(weight, activity_level, life_stage, days)
+    variants = package_variants([meal.dry_food_id, meal.wet_food_id, meal.treats_id])
+    shopping_list = recommend_package_sizes(supply, meal, variants)
     
     context = {
         'meal': meal,
@@ -111,11 +203,42 @@ def meal_detail(request, meal_id):
         'shopping_list': shopping_list,
         'weight': weight,
         'activity_level': activity_level,
+        'days': days,
+        'size_category': get_size_category(weight),
     }
     
     return render(request, 'meals/meal_detail.html', context)
 
 
+def affiliate_click(request, product_id):
+    """Log an outbound affiliate click and redirect to the retailer"""
+    link = get_affiliate_link(product_id)
+    if link is None:
+        raise Http404('No such product')
+    
+    try:
+        meal_id = int(request.GET['meal'])
+    except (KeyError, ValueError):
+        meal_id = None
+    
+    size_category = request.GET.get('size', '')
+    if size_category not in dict(Meal.SIZE_CATEGORIES):
+        try:
+            size_category = get_size_category(int(request.GET['weight']))
+        except (KeyError, ValueError):
+            size_category = ''
+    
+    # Buffered; written to the database in batches off the request path
+    click_buffer.record(
+        product_id=product_id,
+        meal_id=meal_id,
+        size_category=size_category,
+        referrer=request.META.get('HTTP_REFERER', '')[:500],
+        clicked_at=timezone.now(),
+    )
+    return HttpResponseRedirect(link)
+
+
 @login_required
 def save_meal(request, meal_id):
     """Save a meal to user's profile"""
@@ -134,10 +257,7 @@ def save_meal(request, meal_id):
                 user=request.user,
                 pet=pet,
                 meal=meal,
-                daily_calories=portions['daily_calories'],
-                dry_food_oz=portions['dry_food_oz'],
-                wet_food_oz=portions['wet_food_oz'],
-                treat_calories=portions['treat_calories'],
+                **SavedMeal.portion_values(portions),
             )
             
             messages.success(request, f'Meal saved for {pet.name}!')